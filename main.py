@@ -1,16 +1,49 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends
-from src.routes import upload_excel_route, auth_route,meta_table_route,extract_graph_data_route
-from src.models import meta_table_model
-from src.database.connect_db import engine
-from src.middleware.auth_middleware import get_user_authenticated
+from src.routes import upload_excel_route, auth_route,meta_table_route,extract_graph_data_route,internal_route
+from src.config.config import AUTO_CREATE_SCHEMA, SERVER_ROLE, GRAPH_REQUEST_TIMEOUT
+from src.middleware.auth_middleware import get_user_authenticated, get_admin_user
+from src.middleware.request_context_middleware import track_request_route
+from src.middleware.request_cancellation_middleware import RequestCancellationMiddleware, request_timeout
+from src.services.upload_sessions import upload_sessions
 from fastapi.middleware.cors import CORSMiddleware
 
 
+# ----------------------------------------
+# 🔹 Database Setup
+# ----------------------------------------
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Creates missing tables on startup rather than at import time, so importing
+    the app never opens a database connection. Disable with
+    `AUTO_CREATE_SCHEMA=False` and run `python -m src.database.init_db` instead.
+    """
+    if AUTO_CREATE_SCHEMA:
+        from src.database.init_db import create_schema
+        create_schema()
+
+    collector = None
+    if SERVER_ROLE in ("all", "ingest"):
+        # Drop resumable uploads abandoned while the server was down, then keep sweeping
+        upload_sessions.collect_garbage(force=True)
+        collector = asyncio.create_task(upload_sessions.run_garbage_collector())
+
+    yield
+
+    if collector is not None:
+        collector.cancel()
+
 # ----------------------------------------
 # 🔹 FastAPI App Initialization
 # ----------------------------------------
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan, dependencies=[Depends(track_request_route)])
+
+# Added first so that CORS headers are also set on its 504 responses
+app.add_middleware(RequestCancellationMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,28 +53,26 @@ app.add_middleware(
     allow_headers=["*"], 
 )
 
-# ----------------------------------------
-# 🔹 Database Setup
-# ----------------------------------------
-
-meta_table_model.Base.metadata.create_all(bind=engine)
-
 # ----------------------------------------
 # 🔹 Route Registration
 # ----------------------------------------
-
-app.include_router(
-    upload_excel_route.router, 
-    prefix="/api/v1", 
-    tags=["Upload Excel"], 
-    dependencies=[Depends(get_user_authenticated)]
-)
-
-app.include_router(
-    meta_table_route.router, 
-    prefix="/api/v1", 
-    tags=["Save Metadata"]
-)
+# SERVER_ROLE splits traffic between worker pools: "ingest" workers only
+# serve uploads, "read" workers only serve dataset reads, "all" serves both.
+
+if SERVER_ROLE in ("all", "ingest"):
+    app.include_router(
+        upload_excel_route.router, 
+        prefix="/api/v1", 
+        tags=["Upload Excel"], 
+        dependencies=[Depends(get_user_authenticated)]
+    )
+
+if SERVER_ROLE in ("all", "read"):
+    app.include_router(
+        meta_table_route.router, 
+        prefix="/api/v1", 
+        tags=["Save Metadata"]
+    )
 
 app.include_router(
     auth_route.router, 
@@ -49,10 +80,20 @@ app.include_router(
     tags=["Authentication"]
 )
 
+if SERVER_ROLE in ("all", "read"):
+    app.include_router(
+        extract_graph_data_route.router,
+        prefix="/api/v1",
+        tags=["Extract Graph Data"],
+        dependencies=[Depends(request_timeout(GRAPH_REQUEST_TIMEOUT))]
+    )
+
 app.include_router(
-    extract_graph_data_route.router,
-    prefix="/api/v1",
-    tags=["Extract Graph Data"]
+    internal_route.router,
+    prefix="/api/v1/internal",
+    tags=["Internal"],
+    # Slow query plans and pool statistics expose other users' datasets
+    dependencies=[Depends(get_admin_user)]
 )
 
 # ----------------------------------------
@@ -72,5 +113,6 @@ def read_root():
 # ----------------------------------------
 
 if __name__ == "__main__":
+    # Development server; use `python -m src.server` in production
     import uvicorn
     uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
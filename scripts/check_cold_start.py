@@ -0,0 +1,129 @@
+"""
+Cold start budget check.
+
+Measures how long `import main` takes (via `python -X importtime`) and how long
+a fresh uvicorn process needs to answer its first request, and fails when
+either exceeds its budget or when a heavy ingestion dependency is imported
+eagerly.
+
+Usage:
+    python scripts/check_cold_start.py
+    python scripts/check_cold_start.py --import-budget-ms 600 --first-response-budget-ms 2500
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that only the ingestion path needs; none may load on `import main`.
+LAZY_MODULES = ["pandas", "numpy", "openpyxl", "magic", "passlib", "bcrypt"]
+
+# ─────────────────────────────────────────────────────────────────
+# IMPORT TIME
+# ─────────────────────────────────────────────────────────────────
+
+def measure_import_time(env: dict):
+    """
+    Runs `python -X importtime -c "import main"` and returns the cumulative
+    import time in milliseconds and the set of top-level packages imported.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"`import main` failed:\n{result.stderr[-2000:]}")
+
+    total_us = 0
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        if not cumulative.isdigit():
+            continue  # header line
+        imported.add(name.split(".")[0])
+
+        # Only outermost imports (no indentation) add up to the total
+        if not line.split("|")[2].startswith("  "):
+            total_us += int(cumulative)
+
+    return total_us / 1000, imported
+
+# ─────────────────────────────────────────────────────────────────
+# TIME TO FIRST RESPONSE
+# ─────────────────────────────────────────────────────────────────
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_first_response(env: dict, timeout: float = 30.0) -> float:
+    """
+    Starts uvicorn in a fresh process and returns the milliseconds until
+    `GET /` first answers with 200.
+    """
+    port = _free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise RuntimeError("uvicorn exited before serving a request")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - start) * 1000
+            except OSError:
+                time.sleep(0.02)
+        raise RuntimeError(f"No response within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check cold start budgets.")
+    parser.add_argument("--import-budget-ms", type=float, default=1200)
+    parser.add_argument("--first-response-budget-ms", type=float, default=2000)
+    parser.add_argument("--runs", type=int, default=3, help="Best of N runs is reported")
+    parser.add_argument("--skip-server", action="store_true", help="Only measure import time")
+    args = parser.parse_args()
+
+    # Schema creation needs a live database and is a deploy step, not part of cold start
+    env = {**os.environ, "AUTO_CREATE_SCHEMA": "False"}
+
+    import_ms, imported = min(measure_import_time(env) for _ in range(args.runs))
+    eager = sorted(set(LAZY_MODULES) & imported)
+
+    report = {
+        "import_ms": round(import_ms, 1),
+        "import_budget_ms": args.import_budget_ms,
+        "eagerly_imported": eager,
+    }
+    failed = import_ms > args.import_budget_ms or bool(eager)
+
+    if not args.skip_server:
+        first_response_ms = min(measure_first_response(env) for _ in range(args.runs))
+        report["first_response_ms"] = round(first_response_ms, 1)
+        report["first_response_budget_ms"] = args.first_response_budget_ms
+        failed = failed or first_response_ms > args.first_response_budget_ms
+
+    report["ok"] = not failed
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Columnar engine parity check.
+
+Runs every graph aggregation (each region x hierarchy level) of the given
+datasets through both the SQL path and the in-process columnar engine, and
+fails unless the results are identical, value for value and scale for scale
+(`ROUND(..., 3)` returns e.g. 12.300, so must the engine).
+
+Usage:
+    python scripts/check_columnar_parity.py            # every dataset
+    python scripts/check_columnar_parity.py <table_id> [<table_id> ...]
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from src.config.config import COLUMNAR_CACHE_MAX_BYTES, COLUMNAR_MAX_DATASET_BYTES
+from src.controllers.extract_graph_data_controller import _build_graph_query, _years_in_range
+from src.database.connect_db import SessionLocal
+from src.models.meta_table_model import MetaTable
+from src.services.columnar_engine import ColumnarEngine
+
+
+def _as_comparable(rows):
+    # str() keeps the scale, so Decimal("1.2") and Decimal("1.200") differ
+    return sorted(
+        (str(row[0]), tuple(None if value is None else str(value) for value in row[1:]))
+        for row in rows
+    )
+
+
+def check_table(db, engine: ColumnarEngine, table: MetaTable) -> int:
+    table_name = table.table_name
+    on_shard = {"shard": table.shard}
+    columns = list(db.execute(text(f"SELECT * FROM {table_name} LIMIT 0"), bind_arguments=on_shard).keys())
+    years = _years_in_range(columns)
+    levels = [col for col in columns if "segment" in col]
+    mismatches = 0
+
+    for region in table.region or []:
+        for level in levels:
+            query = _build_graph_query(table_name, level, years)
+            expected = db.execute(query, {"region": region}, bind_arguments=on_shard).fetchall()
+            actual = engine.group_sums(db, table_name, region, level, years, shard=table.shard)
+
+            if actual is None:
+                print(f"SKIP  {table_name}: not held by the columnar engine")
+                return 0
+            if _as_comparable(expected) != _as_comparable(actual):
+                mismatches += 1
+                print(f"DIFF  {table_name} region={region!r} level={level}")
+            else:
+                print(f"OK    {table_name} region={region!r} level={level} ({len(actual)} groups)")
+
+    return mismatches
+
+
+def main(table_ids):
+    engine = ColumnarEngine(COLUMNAR_CACHE_MAX_BYTES, COLUMNAR_MAX_DATASET_BYTES)
+    db = SessionLocal()
+    try:
+        query = db.query(MetaTable)
+        if table_ids:
+            query = query.filter(MetaTable.id.in_(table_ids))
+        mismatches = sum(check_table(db, engine, table) for table in query.all())
+    finally:
+        db.close()
+
+    print(f"{mismatches} mismatching aggregation(s)")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,327 @@
+"""
+HTTP load-test harness for the read API.
+
+Seeds a local Postgres with synthetic datasets through the real ingest path,
+logs in through `/api/v1/auth/login`, then drives a weighted mix of read
+requests either at a fixed concurrency (closed loop) or at a target request
+rate (open loop), and prints per-route latency percentiles, throughput and
+error rate as JSON.
+
+Usage:
+    # 1. seed synthetic datasets and the load-test user (uses DATABASE_URL)
+    python scripts/load_test.py seed --datasets 20 --rows 20000
+
+    # 2. run against a server started separately (e.g. python -m src.server)
+    python scripts/load_test.py run --base-url http://127.0.0.1:8000 \
+        --concurrency 32 --duration 60 --out results.json
+    python scripts/load_test.py run --rate 200 --duration 60 \
+        --mix graph=6,regions=2,tables=1,table=1,login=0.2
+
+Compare the JSON of two runs to compare commits or worker/pool settings.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+LOAD_TEST_USER = {
+    "name": "Load Test",
+    "email": "loadtest@example.com",
+    "phone": "0000000000",
+    "password": "load-test-password",
+}
+
+DEFAULT_MIX = "graph=6,regions=2,tables=1,table=1,login=0.2"
+
+REGIONS = ["North America", "Europe", "Asia Pacific", "Latin America", "Middle East & Africa"]
+SEGMENTS = {
+    "Hardware": ["Servers", "Storage", "Networking"],
+    "Software": ["Platform", "Applications"],
+    "Services": ["Consulting", "Managed", "Support"],
+}
+
+# ─────────────────────────────────────────────────────────────────
+# SEEDING
+# ─────────────────────────────────────────────────────────────────
+
+def _synthetic_frame(rows: int, start_year: int, end_year: int, rng: random.Random):
+    import pandas as pd
+
+    segment_pairs = [(segment, sub) for segment, subs in SEGMENTS.items() for sub in subs]
+    records = []
+    for _ in range(rows):
+        segment, sub_segment = rng.choice(segment_pairs)
+        record = {"region": rng.choice(REGIONS), "segment": segment, "sub_segment": sub_segment}
+        base = rng.uniform(1, 500)
+        for year in range(start_year, end_year + 1):
+            base *= rng.uniform(0.95, 1.15)
+            record[f"year_{year}"] = round(base, 4)
+        records.append(record)
+    return pd.DataFrame(records)
+
+
+def seed(args):
+    """Creates the load-test user and `--datasets` synthetic datasets."""
+    from src.database.connect_db import SessionLocal
+    from src.database.init_db import create_schema
+    from src.models.user_model import UserModel
+    from src.services.db_operations import store_dataset
+    from src.utils.utils import generate_short_uuid
+
+    create_schema()
+    rng = random.Random(args.seed)
+    db = SessionLocal()
+    try:
+        if not db.query(UserModel).filter(UserModel.email == LOAD_TEST_USER["email"]).first():
+            db.add(UserModel(
+                id=generate_short_uuid(),
+                name=LOAD_TEST_USER["name"],
+                email=LOAD_TEST_USER["email"],
+                phone=LOAD_TEST_USER["phone"],
+                password=UserModel.hash_password(LOAD_TEST_USER["password"]),
+            ))
+            db.commit()
+
+        for i in range(args.datasets):
+            start_year = rng.randint(2018, 2022)
+            df = _synthetic_frame(args.rows, start_year, start_year + 10, rng)
+            # Fresh ids on every run: the seeded RNG only shapes the data, so
+            # seeding again adds datasets instead of colliding with existing ones
+            table_id = uuid.uuid4().hex[:8]
+            table_name = f"loadtest_market_{i}_{table_id}"
+
+            started = time.perf_counter()
+            store_dataset(df, table_name, table_id, db, market_name=f"Load Test Market {i}")
+            print(f"Seeded {table_name} ({args.rows} rows) in {time.perf_counter() - started:.2f}s")
+    finally:
+        db.close()
+
+# ─────────────────────────────────────────────────────────────────
+# REQUEST MIX
+# ─────────────────────────────────────────────────────────────────
+
+def _parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    unknown = set(weights) - {"graph", "regions", "tables", "table", "login"}
+    if unknown:
+        raise SystemExit(f"Unknown routes in --mix: {', '.join(sorted(unknown))}")
+    return weights
+
+
+class Workload:
+    """Picks requests according to the mix, over the datasets the server knows."""
+
+    def __init__(self, client, datasets: list, weights: dict, rng: random.Random):
+        self.client = client
+        self.datasets = datasets
+        self.names = list(weights)
+        self.weights = list(weights.values())
+        self.rng = rng
+
+    def next_request(self):
+        name = self.rng.choices(self.names, self.weights)[0]
+        dataset = self.rng.choice(self.datasets)
+
+        if name == "graph":
+            body = {"table_id": dataset["id"], "region": self.rng.choice(dataset["regions"])}
+            return name, self.client.post("/api/v1/extract-graph-data", json=body)
+        if name == "regions":
+            return name, self.client.post("/api/v1/get-regions", json={"table_id": dataset["id"]})
+        if name == "tables":
+            return name, self.client.get("/api/v1/tables")
+        if name == "table":
+            return name, self.client.get(f"/api/v1/tables/{dataset['id']}")
+        return name, self.client.post("/api/v1/auth/login", json={
+            "email": LOAD_TEST_USER["email"], "password": LOAD_TEST_USER["password"],
+        })
+
+# ─────────────────────────────────────────────────────────────────
+# RUNNER
+# ─────────────────────────────────────────────────────────────────
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.recording = False
+
+    async def measure(self, name: str, request):
+        started = time.perf_counter()
+        try:
+            response = await request
+            failed = response.status_code >= 400
+        except Exception:
+            failed = True
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        if self.recording:
+            self.latencies[name].append(elapsed_ms)
+            if failed:
+                self.errors[name] += 1
+
+
+def _percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return round(sorted_values[rank], 2)
+
+
+def _summarize(latencies: list, errors: int, duration: float) -> dict:
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "error_rate": round(errors / len(values), 4) if values else 0,
+        "throughput_rps": round(len(values) / duration, 2),
+        "p50_ms": _percentile(values, 50),
+        "p95_ms": _percentile(values, 95),
+        "p99_ms": _percentile(values, 99),
+        "max_ms": round(values[-1], 2) if values else None,
+    }
+
+
+async def _login(client):
+    response = await client.post("/api/v1/auth/login", json={
+        "email": LOAD_TEST_USER["email"], "password": LOAD_TEST_USER["password"],
+    })
+    response.raise_for_status()
+    # The cookie is `Secure`, so it would not be replayed over plain http; set it explicitly
+    client.cookies.set("access_token", response.json()["access_token"])
+
+
+async def _discover_datasets(client, limit: int) -> list:
+    response = await client.get("/api/v1/tables")
+    response.raise_for_status()
+    datasets = []
+    for table in response.json()[:limit]:
+        regions = table.get("region") or []
+        if regions:
+            datasets.append({"id": table["id"], "regions": regions})
+    if not datasets:
+        raise SystemExit("No datasets with regions found; run the `seed` command first.")
+    return datasets
+
+
+async def _run(args):
+    import httpx
+
+    weights = _parse_mix(args.mix)
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=args.max_connections or args.concurrency or 1000)
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        await _login(client)
+        workload = Workload(client, await _discover_datasets(client, args.datasets), weights, rng)
+        recorder = Recorder()
+        stop_at = time.perf_counter() + args.warmup + args.duration
+
+        async def closed_loop_worker():
+            while time.perf_counter() < stop_at:
+                await recorder.measure(*workload.next_request())
+
+        async def open_loop():
+            in_flight = set()
+            interval = 1 / args.rate
+            next_at = time.perf_counter()
+            while next_at < stop_at:
+                await asyncio.sleep(max(0, next_at - time.perf_counter()))
+                task = asyncio.create_task(recorder.measure(*workload.next_request()))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+                next_at += rng.expovariate(1 / interval)  # Poisson arrivals
+            if in_flight:
+                await asyncio.gather(*in_flight)
+
+        async def start_recording():
+            await asyncio.sleep(args.warmup)
+            recorder.recording = True
+
+        started = time.perf_counter()
+        recording_task = asyncio.create_task(start_recording())
+        if args.rate:
+            await open_loop()
+        else:
+            await asyncio.gather(*[closed_loop_worker() for _ in range(args.concurrency)])
+        await recording_task
+        measured = time.perf_counter() - started - args.warmup
+
+    all_latencies = [value for values in recorder.latencies.values() for value in values]
+    return {
+        "config": {
+            "base_url": args.base_url,
+            "mode": "rate" if args.rate else "concurrency",
+            "rate": args.rate,
+            "concurrency": None if args.rate else args.concurrency,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "mix": weights,
+            "commit": _git_commit(),
+        },
+        "routes": {
+            name: _summarize(values, recorder.errors[name], measured)
+            for name, values in sorted(recorder.latencies.items())
+        },
+        "total": _summarize(all_latencies, sum(recorder.errors.values()), measured),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except Exception:
+        return None
+
+
+def run(args):
+    report = json.dumps(asyncio.run(_run(args)), indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(report)
+    print(report)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the read API.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = commands.add_parser("seed", help="Create synthetic datasets and the load-test user")
+    seed_parser.add_argument("--datasets", type=int, default=10)
+    seed_parser.add_argument("--rows", type=int, default=10000)
+    seed_parser.add_argument("--seed", type=int, default=42)
+    seed_parser.set_defaults(handler=seed)
+
+    run_parser = commands.add_parser("run", help="Drive read traffic and report latencies")
+    run_parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    run_parser.add_argument("--concurrency", type=int, default=16, help="Closed-loop workers")
+    run_parser.add_argument("--rate", type=float, default=None, help="Target requests/second (open loop)")
+    run_parser.add_argument("--max-connections", type=int, default=None)
+    run_parser.add_argument("--duration", type=float, default=30, help="Measured seconds")
+    run_parser.add_argument("--warmup", type=float, default=5, help="Unmeasured seconds before recording")
+    run_parser.add_argument("--mix", default=DEFAULT_MIX, help="Route weights, e.g. graph=6,tables=1")
+    run_parser.add_argument("--datasets", type=int, default=50, help="Use at most this many datasets")
+    run_parser.add_argument("--timeout", type=float, default=30)
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--out", help="Also write the JSON report to this file")
+    run_parser.set_defaults(handler=run)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -9,3 +10,77 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 # DEBUG = os.getenv("DEBUG", "False").lower() == "true"  # Convert to boolean
+
+# Slow query log
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "500"))
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE_RATE", "0"))  # 0.0 - 1.0
+SLOW_QUERY_MAX_SHAPES = int(os.getenv("SLOW_QUERY_MAX_SHAPES", "500"))
+
+# Users allowed to call the /internal endpoints (comma separated emails; empty = nobody)
+ADMIN_EMAILS = {email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
+
+# Startup
+AUTO_CREATE_SCHEMA = os.getenv("AUTO_CREATE_SCHEMA", "True").lower() == "true"
+
+# Routes served by this worker pool. The launcher's settings (WEB_WORKERS,
+# WEB_GRACEFUL_TIMEOUT, WEB_MAX_REQUESTS) are read by src/server.py itself.
+SERVER_ROLE = os.getenv("SERVER_ROLE", "all").lower()  # all | read | ingest
+if SERVER_ROLE not in ("all", "read", "ingest"):
+    raise ValueError(f"SERVER_ROLE must be one of all, read, ingest (got '{SERVER_ROLE}')")
+
+# Connection pool (per worker process)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds
+
+# Dataset export
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "10000"))  # rows per fetch / row group
+
+# Cross-dataset comparison
+COMPARE_MAX_TABLES = int(os.getenv("COMPARE_MAX_TABLES", "20"))
+COMPARE_MAX_CONCURRENCY = int(os.getenv("COMPARE_MAX_CONCURRENCY", "4"))  # pooled connections used at once
+
+# Read replicas (comma separated URLs; empty = all reads go to DATABASE_URL)
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "10"))
+REPLICA_HEALTH_CHECK_INTERVAL = float(os.getenv("REPLICA_HEALTH_CHECK_INTERVAL", "5"))  # seconds
+
+# Upload admission control (per worker process)
+UPLOAD_MAX_CONCURRENT = int(os.getenv("UPLOAD_MAX_CONCURRENT", "2"))
+UPLOAD_MAX_INFLIGHT_BYTES = int(os.getenv("UPLOAD_MAX_INFLIGHT_BYTES", str(1024 * 1024 * 1024)))  # 1 GiB
+UPLOAD_QUEUE_SIZE = int(os.getenv("UPLOAD_QUEUE_SIZE", "8"))
+UPLOAD_QUEUE_TIMEOUT = float(os.getenv("UPLOAD_QUEUE_TIMEOUT", "60"))  # seconds
+UPLOAD_RATE_PER_MINUTE = float(os.getenv("UPLOAD_RATE_PER_MINUTE", "10"))  # per user
+UPLOAD_RATE_BURST = int(os.getenv("UPLOAD_RATE_BURST", "5"))
+UPLOAD_RETRY_AFTER = int(os.getenv("UPLOAD_RETRY_AFTER", "30"))  # seconds, when the queue is full
+
+# Resumable (chunked) uploads, staged on local disk until finalized
+UPLOAD_SESSION_DIR = os.getenv("UPLOAD_SESSION_DIR", os.path.join(tempfile.gettempdir(), "tmr-uploads"))
+UPLOAD_SESSION_TTL = int(os.getenv("UPLOAD_SESSION_TTL", str(24 * 3600)))  # seconds since the last chunk
+UPLOAD_SESSION_GC_INTERVAL = int(os.getenv("UPLOAD_SESSION_GC_INTERVAL", "600"))  # seconds
+# Finalizing is admitted against UPLOAD_MAX_INFLIGHT_BYTES; a larger session would have to run alone
+UPLOAD_SESSION_MAX_BYTES = int(os.getenv("UPLOAD_SESSION_MAX_BYTES", str(UPLOAD_MAX_INFLIGHT_BYTES)))
+UPLOAD_CHUNK_MAX_BYTES = int(os.getenv("UPLOAD_CHUNK_MAX_BYTES", str(64 * 1024 * 1024)))  # 64 MiB
+
+# In-process columnar engine for graph aggregations
+COLUMNAR_ENGINE_ENABLED = os.getenv("COLUMNAR_ENGINE_ENABLED", "False").lower() == "true"
+COLUMNAR_CACHE_MAX_BYTES = int(os.getenv("COLUMNAR_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+COLUMNAR_MAX_DATASET_BYTES = int(os.getenv("COLUMNAR_MAX_DATASET_BYTES", str(128 * 1024 * 1024)))
+
+# Build the /extract-graph-data response JSON in Postgres instead of pivoting rows in Python
+GRAPH_JSON_FROM_DB = os.getenv("GRAPH_JSON_FROM_DB", "False").lower() == "true"
+
+# Dataset shards ("name=url" pairs, comma separated); DATABASE_URL is always the "default" shard
+DATABASE_SHARD_URLS = dict(
+    (name.strip(), url.strip())
+    for name, _, url in (part.partition("=") for part in os.getenv("DATABASE_SHARD_URLS", "").split(","))
+    if name.strip() and url.strip()
+)
+SHARD_PLACEMENT = os.getenv("SHARD_PLACEMENT", "manual").lower()  # manual | hash | least_loaded
+
+# Request deadlines (seconds; 0 = none). Clients may shorten them with an X-Request-Timeout header
+REQUEST_TIMEOUT_DEFAULT = float(os.getenv("REQUEST_TIMEOUT_DEFAULT", "0"))
+GRAPH_REQUEST_TIMEOUT = float(os.getenv("GRAPH_REQUEST_TIMEOUT", "60"))
+
+# Coalesce concurrent identical graph / metadata requests into one execution (per worker process)
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "True").lower() == "true"
@@ -0,0 +1,185 @@
+import csv
+import io
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from src.config.config import EXPORT_BATCH_SIZE
+from src.controllers.meta_table_controller import find_table
+from src.services.query_cancellation import RequestCancelled, current_request
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+# ─────────────────────────────────────────────────────────────────
+# QUERY BUILDING
+# ─────────────────────────────────────────────────────────────────
+
+def _build_export_query(table_name: str, columns: list, region: str = None, segment: str = None):
+    """
+    Builds the export SELECT with optional region / segment filters.
+
+    Returns:
+        (query, params) tuple.
+    """
+    filters, params = [], {}
+
+    for column, value in (("region", region), ("segment", segment)):
+        if value is None:
+            continue
+        if column not in columns:
+            raise HTTPException(status_code=400, detail=f"Dataset has no '{column}' column to filter on.")
+        filters.append(f'"{column}" = :{column}')
+        params[column] = value
+
+    column_list = ", ".join([f'"{col}"' for col in columns])
+    query = f'SELECT {column_list} FROM "{table_name}"'
+    if filters:
+        query += " WHERE " + " AND ".join(filters)
+    query += " ORDER BY id"
+
+    return query, params
+
+
+def _iter_batches(bind, query: str, params: dict):
+    """
+    Yields lists of rows read through a server-side (named) cursor, so only
+    one batch is held in memory at a time.
+
+    The connection is opened inside the generator because the response body
+    is produced after the request's own session has been closed.
+
+    A cancelled request (deadline or disconnect) stops the export: a FETCH in
+    progress is cancelled by the server, and no further batch is read.
+    """
+    request = current_request.get()
+    with bind.connect() as connection:
+        result = connection.execution_options(
+            stream_results=True, max_row_buffer=EXPORT_BATCH_SIZE
+        ).execute(text(query), params)
+
+        for batch in result.partitions(EXPORT_BATCH_SIZE):
+            # A cancel request sent between two FETCHes had nothing to stop
+            if request is not None and request.cancelled:
+                raise RequestCancelled(request.cancelled)
+            yield batch
+
+# ─────────────────────────────────────────────────────────────────
+# OUTPUT FORMATS
+# ─────────────────────────────────────────────────────────────────
+
+def _stream_csv(bind, columns: list, query: str, params: dict):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(columns)
+    for batch in _iter_batches(bind, query, params):
+        writer.writerows(batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink:
+    """Minimal writable file that hands its bytes back after each row group."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _arrow_schema(pa, columns: list):
+    # Dataset tables store every uploaded column as TEXT next to a SERIAL id
+    return pa.schema([(col, pa.int64() if col == "id" else pa.string()) for col in columns])
+
+
+def _stream_arrow(bind, columns: list, query: str, params: dict, fmt: str):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(pa, columns)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema) if fmt == "parquet" else pa.ipc.new_stream(sink, schema)
+
+    try:
+        for batch in _iter_batches(bind, query, params):
+            # Each fetched batch becomes one Parquet row group / IPC record batch
+            table = pa.Table.from_pylist([dict(row._mapping) for row in batch], schema=schema)
+            writer.write_table(table)
+            yield sink.drain()
+    finally:
+        writer.close()
+
+    yield sink.drain()
+
+# ─────────────────────────────────────────────────────────────────
+# DATASET EXPORT
+# ─────────────────────────────────────────────────────────────────
+
+def export_dataset(table_id: str, fmt: str, region: str, segment: str, db: Session):
+    """
+    Streams all rows of a dataset as CSV, Parquet or Arrow IPC.
+
+    Rows are fetched in batches of `EXPORT_BATCH_SIZE` from a server-side
+    cursor and written out batch by batch, so memory use does not grow with
+    the size of the dataset.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format. Use one of: {', '.join(EXPORT_FORMATS)}")
+
+    table = find_table(db, table_id)
+    if not table:
+        raise HTTPException(status_code=404, detail="Table not found.")
+
+    table_name = table.table_name
+    columns = list(db.execute(
+        text(f'SELECT * FROM "{table_name}" LIMIT 0'), bind_arguments={"shard": table.shard}
+    ).keys())
+    query, params = _build_export_query(table_name, columns, region, segment)
+
+    # Stream from the dataset's shard; on the default shard, from the same
+    # database (replica or primary) the metadata came from
+    bind = db.get_bind(shard=table.shard)
+
+    if fmt == "csv":
+        body = _stream_csv(bind, columns, query, params)
+    else:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=501, detail=f"{fmt} export requires pyarrow to be installed.")
+        body = _stream_arrow(bind, columns, query, params, fmt)
+
+    media_type, extension = EXPORT_FORMATS[fmt]
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{table_name}.{extension}"'},
+    )
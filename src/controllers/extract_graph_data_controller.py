@@ -1,52 +1,219 @@
-from fastapi import HTTPException
+import asyncio
+from fastapi import HTTPException, Response
+from src.config.config import COMPARE_MAX_TABLES, COMPARE_MAX_CONCURRENCY, COLUMNAR_ENGINE_ENABLED, GRAPH_JSON_FROM_DB
+from src.database.connect_db import ReadSessionLocal, read_session_like, reads_from_replica, use_primary
 from src.models.meta_table_model import MetaTable
-from sqlalchemy import text
-import json
+from src.controllers.meta_table_controller import find_table
+from src.services.columnar_engine import columnar_engine
+from src.services.single_flight import single_flight
+from src.utils.utils import split_date
+from sqlalchemy import text, bindparam
 
 async def get_regions(table_id:str,db):
-    table = db.query(MetaTable).filter(MetaTable.id == table_id).first()
-    if not table:
-        raise HTTPException(status_code=404, detail="Table not found.")
-    
-    regions = json.loads(table.region)
-    return regions
-
-
-async def extract_graph_data(req, db):
+    def lookup(flight_db):
+        try:
+            table = find_table(flight_db, table_id)
+            if not table:
+                raise HTTPException(status_code=404, detail="Table not found.")
+
+            return table.region or []
+        finally:
+            flight_db.close()
+
+    # Concurrent lookups of the same dataset share one query. It runs off the
+    # event loop, so identical requests can join meanwhile, and on its own
+    # session, since it may outlive this request's `db`
+    return await single_flight.run(
+        "get_regions", {"table_id": table_id}, lambda: asyncio.to_thread(lookup, read_session_like(db))
+    )
+
+
+def _years_in_range(columns: list, start_year: int = None, end_year: int = None):
+    """Returns the `year_*` columns between `start_year` and `end_year` (inclusive)."""
+    years = []
+    for col in columns:
+        if not col.startswith("year_"):
+            continue
+        try:
+            year = split_date(col)
+        except ValueError:
+            continue
+        if (start_year is None or year >= start_year) and (end_year is None or year <= end_year):
+            years.append(col)
+    return years
+
+
+def _year_columns(columns: list, table: MetaTable, start_year: int = None, end_year: int = None):
     """
-    Extracts aggregated year-wise data from the database for graph plotting,
-    grouped by segment and formatted as an array of objects.
+    Selects the `year_*` columns inside the requested range.
+
+    The range is validated against the `start_year`/`end_year` recorded for the
+    dataset in MetaTable; a range outside of it is rejected with a 400.
     """
+    if start_year is not None and end_year is not None and start_year > end_year:
+        raise HTTPException(status_code=400, detail="start_year must not be after end_year.")
+
+    for year in (start_year, end_year):
+        if year is None:
+            continue
+        if (table.start_year is not None and year < table.start_year) or \
+           (table.end_year is not None and year > table.end_year):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Year {year} is outside the dataset range {table.start_year}-{table.end_year}.",
+            )
+
+    years = _years_in_range(columns, start_year, end_year)
+    if not years:
+        raise HTTPException(status_code=400, detail="No year-based columns found.")
 
-    table_id = req.table_id
-    region = req.region
-    
-    # Fetch table details
-    table = db.query(MetaTable).filter(MetaTable.id == table_id).first()
-    if not table:
-        raise HTTPException(status_code=404, detail="Table not found.")
+    return years
 
-    table_name = table.table_name
 
-    # Identify all year-based columns dynamically
-    result = db.execute(text(f"SELECT * FROM {table_name} LIMIT 1"))
-    years = [col for col in result.keys() if col.startswith("year_")]
+def _level_column(columns: list, level: str):
+    """Validates the requested hierarchy level against the dataset's segment columns."""
+    segment_columns = [col for col in columns if "segment" in col]
+    if level not in segment_columns:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid level '{level}'. Available levels: {', '.join(segment_columns)}",
+        )
+    return level
 
-    if not years:
-        raise HTTPException(status_code=400, detail="No year-based columns found.")
 
+def _build_graph_query(table_name: str, level: str, years: list, segments: list = None):
+    """
+    Builds the grouped SUM query for the selected years, optionally restricted
+    to a whitelist of `level` values.
+    """
     # Build SUM query dynamically for selected years
     sum_columns = ", ".join([f"ROUND(SUM({year}::NUMERIC), 3) AS {year}" for year in years])
 
-    # Optimize query by fetching all required data in a single execution
     query = f"""
-        SELECT segment, {sum_columns}
+        SELECT {level}, {sum_columns}
         FROM {table_name}
         WHERE region=:region
-        GROUP BY segment
     """
-    
-    sum_result = db.execute(text(query), {"region": region}).fetchall()
+    if segments:
+        query += f" AND {level} IN :segments"
+    query += f" GROUP BY {level}"
+
+    statement = text(query)
+    if segments:
+        statement = statement.bindparams(bindparam("segments", expanding=True))
+
+    return statement
+
+
+def _build_graph_json_query(table_name: str, level: str, years: list, segments: list = None):
+    """
+    Wraps the grouped SUM query so Postgres returns the final graph payload,
+    `[{"year": "2020", "<segment>": value, ...}, ...]`, as a single text value.
+
+    The year columns are unnested with a LATERAL VALUES list, pivoted per year
+    with `jsonb_object_agg` and collected in column order with `json_agg`.
+    """
+    aggregate = _build_graph_query(table_name, level, years, segments)
+    year_values = ", ".join(
+        [f"('{year.split('_')[1]}', {i}, agg.{year})" for i, year in enumerate(years)]
+    )
+
+    query = f"""
+        WITH agg AS ({aggregate.text}),
+        cells AS (
+            SELECT v.year, v.ord, agg.{level} AS grp, v.value
+            FROM agg
+            CROSS JOIN LATERAL (VALUES {year_values}) AS v(year, ord, value)
+        )
+        SELECT COALESCE(json_agg(point ORDER BY ord), '[]')::text
+        FROM (
+            SELECT ord, jsonb_build_object('year', year) || jsonb_object_agg(COALESCE(grp, 'null'), value) AS point
+            FROM cells
+            GROUP BY year, ord
+        ) points
+    """
+
+    statement = text(query)
+    if segments:
+        statement = statement.bindparams(bindparam("segments", expanding=True))
+
+    return statement
+
+
+async def extract_graph_data(req, db):
+    """
+    Extracts aggregated year-wise data from the database for graph plotting,
+    grouped by segment and formatted as an array of objects.
+
+    Only the requested year range and segments are aggregated in SQL. With
+    `GRAPH_JSON_FROM_DB` set, SQL also does the pivot and the JSON encoding
+    (unless the columnar engine already answered).
+
+    Concurrent identical requests (same body, segments in any order) share a
+    single lookup and aggregation.
+    """
+    payload = req.model_dump()
+    payload["segments"] = sorted(set(req.segments)) if req.segments else None
+
+    # The shared call gets its own session: it may outlive this request's `db`
+    return await single_flight.run(
+        "extract_graph_data", payload, lambda: asyncio.to_thread(_extract_graph_data, req, read_session_like(db))
+    )
+
+
+def _extract_graph_data(req, db):
+    """
+    Serves one graph request on `db`, a session of its own that is closed
+    afterwards. Blocks on the database, so it runs in a worker thread and the
+    event loop stays free to notice a client disconnect and cancel it.
+    """
+    try:
+        # Fetch table details
+        table = find_table(db, req.table_id)
+        if not table:
+            raise HTTPException(status_code=404, detail="Table not found.")
+
+        return _aggregate_graph_data(req, table, db)
+    finally:
+        db.close()
+
+
+def _aggregate_graph_data(req, table: MetaTable, db):
+    region = req.region
+    table_name = table.table_name
+    # Dataset statements run on the shard that holds the table
+    on_shard = {"shard": table.shard}
+
+    # Identify the dataset's columns without reading any rows
+    columns = list(db.execute(text(f"SELECT * FROM {table_name} LIMIT 0"), bind_arguments=on_shard).keys())
+    years = _year_columns(columns, table, req.start_year, req.end_year)
+    level = _level_column(columns, req.level)
+
+    # Hot datasets are answered from memory when the columnar engine is on
+    sum_result = None
+    if COLUMNAR_ENGINE_ENABLED:
+        sum_result = columnar_engine.group_sums(
+            db, table_name, region, level, years, req.segments, shard=table.shard
+        )
+
+    if sum_result is None and GRAPH_JSON_FROM_DB:
+        # Postgres builds the response body; pass its JSON through untouched
+        query = _build_graph_json_query(table_name, level, years, req.segments)
+        params = {"region": region}
+        if req.segments:
+            params["segments"] = req.segments
+
+        result = db.execute(query, params, bind_arguments=on_shard)
+        return Response(content=result.scalar(), media_type="application/json")
+
+    if sum_result is None:
+        # Optimize query by fetching all required data in a single execution
+        query = _build_graph_query(table_name, level, years, req.segments)
+        params = {"region": region}
+        if req.segments:
+            params["segments"] = req.segments
+
+        sum_result = db.execute(query, params, bind_arguments=on_shard).fetchall()
 
     # Restructure the response to match the required format
     transformed_data = {}
@@ -70,6 +237,124 @@ async def extract_graph_data(req, db):
 
 
 
+# ─────────────────────────────────────────────────────────────────
+# CROSS-DATASET COMPARISON
+# ─────────────────────────────────────────────────────────────────
+
+def _aggregate_table_series(table: dict, routing: dict, region: str, level: str, segment: str, start_year: int, end_year: int):
+    """
+    Sums one dataset's year columns for a region (and optionally one segment)
+    on its own pooled connection, routed like the request's session.
+
+    The requested range is clipped to the dataset's own years instead of
+    being rejected, since compared datasets rarely cover the same span.
+
+    Returns:
+        dict mapping year ("2024") to the rounded total.
+    """
+    table_name = table["table_name"]
+    on_shard = {"shard": table["shard"]}
+
+    db = ReadSessionLocal(info=routing)
+    try:
+        columns = list(db.execute(text(f"SELECT * FROM {table_name} LIMIT 0"), bind_arguments=on_shard).keys())
+        years = _years_in_range(columns, start_year, end_year)
+        if not years:
+            return {}
+
+        sum_columns = ", ".join([f"ROUND(SUM({year}::NUMERIC), 3) AS {year}" for year in years])
+        query = f"SELECT {sum_columns} FROM {table_name} WHERE region=:region"
+        params = {"region": region}
+
+        if segment is not None:
+            query += f" AND {_level_column(columns, level)} = :segment"
+            params["segment"] = segment
+
+        row = db.execute(text(query), params, bind_arguments=on_shard).fetchone()
+        return {year.split("_")[1]: row[i] for i, year in enumerate(years)}
+
+    finally:
+        db.close()
+
+
+def _find_tables(db, table_ids: list):
+    """
+    Returns (MetaTable rows by id, ids not found), re-reading from the primary
+    when a replica lacks some of them.
+    """
+    tables = {table.id: table for table in db.query(MetaTable).filter(MetaTable.id.in_(table_ids)).all()}
+    missing = [table_id for table_id in table_ids if table_id not in tables or tables[table_id].region is None]
+    if missing and reads_from_replica(db):
+        # Recently uploaded datasets may not have replicated yet
+        use_primary(db)
+        tables = {
+            table.id: table
+            for table in db.query(MetaTable).filter(MetaTable.id.in_(table_ids)).populate_existing().all()
+        }
+        missing = [table_id for table_id in table_ids if table_id not in tables]
+    return tables, missing
+
+
+async def compare_graph_data(req, db):
+    """
+    Compares the same region/segment across several datasets.
+
+    Each dataset is resolved through MetaTable and aggregated concurrently on
+    a separate pooled connection, at most `COMPARE_MAX_CONCURRENCY` at a time.
+    The per-dataset totals are merged into one year-aligned series; a year a
+    dataset does not cover is returned as `null` for that dataset.
+    """
+    table_ids = list(dict.fromkeys(req.table_ids))  # De-duplicate, keep order
+    if not table_ids:
+        raise HTTPException(status_code=400, detail="At least one table_id is required.")
+    if len(table_ids) > COMPARE_MAX_TABLES:
+        raise HTTPException(status_code=400, detail=f"At most {COMPARE_MAX_TABLES} tables can be compared.")
+
+    if req.start_year is not None and req.end_year is not None and req.start_year > req.end_year:
+        raise HTTPException(status_code=400, detail="start_year must not be after end_year.")
+
+    tables, missing = await asyncio.to_thread(_find_tables, db, table_ids)
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Table not found: {', '.join(missing)}")
+
+    # Plain dicts cross the thread boundary; ORM instances stay with `db`
+    datasets = [
+        {
+            "table_id": table_id,
+            "table_name": tables[table_id].table_name,
+            "shard": tables[table_id].shard,
+            "market_name": tables[table_id].market_name,
+            "start_year": tables[table_id].start_year,
+            "end_year": tables[table_id].end_year,
+        }
+        for table_id in table_ids
+    ]
+
+    # Worker sessions read from wherever the MetaTable rows were found
+    routing = {"replica": db.info.get("replica"), "use_primary": db.info.get("use_primary", False)}
+    semaphore = asyncio.Semaphore(COMPARE_MAX_CONCURRENCY)
+
+    async def aggregate(dataset):
+        async with semaphore:
+            return await asyncio.to_thread(
+                _aggregate_table_series, dataset, routing, req.region, req.level,
+                req.segment, req.start_year, req.end_year,
+            )
+
+    series = await asyncio.gather(*[aggregate(dataset) for dataset in datasets])
+
+    # Align every dataset on the union of years
+    all_years = sorted({year for values in series for year in values}, key=int)
+    merged = []
+    for year in all_years:
+        point = {"year": year}
+        for dataset, values in zip(datasets, series):
+            point[dataset["table_id"]] = values.get(year)
+        merged.append(point)
+
+    return {"datasets": datasets, "data": merged}
+
+
 # async def extract_graph_data(req, db):
 #     """
 #     Extracts aggregated year-wise data from the database for graph plotting,
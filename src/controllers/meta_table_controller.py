@@ -1,20 +1,119 @@
+import asyncio
 from src.models.meta_table_model import MetaTable
+from src.database.connect_db import read_session_like, reads_from_replica, use_primary
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
-import json
-
-def get_table_by_id(id: int, db: Session):
-    table = db.query(MetaTable).filter(MetaTable.id == id).first()
-    if not table:
-        raise HTTPException(status_code=404, detail="Table not found")
-    
-    # Ensure `table.region` is returned as a valid JSON object
-    table.region = json.loads(table.region)
+from fastapi.encoders import jsonable_encoder
+from src.services.single_flight import single_flight
+
+def find_table(db: Session, table_id: str):
+    """
+    Looks up a dataset in MetaTable.
+
+    On a replica session a missing or not yet finalized row may simply not
+    have replicated; the lookup is then repeated on the primary and the
+    session stays pinned there, so the dataset's rows are read from the
+    same place as its metadata.
+    """
+    table = db.query(MetaTable).filter(MetaTable.id == table_id).first()
+    if (table is None or table.region is None) and reads_from_replica(db):
+        use_primary(db)
+        table = db.query(MetaTable).filter(MetaTable.id == table_id).populate_existing().first()
     return table
 
 
+async def get_table_by_id(id: int, db: Session):
+    def lookup(flight_db):
+        try:
+            table = find_table(flight_db, id)
+            if not table:
+                raise HTTPException(status_code=404, detail="Table not found")
+
+            # Plain data, since the session is closed before the result is returned
+            return jsonable_encoder(table)
+        finally:
+            flight_db.close()
+
+    # Concurrent lookups of the same dataset share one query. It runs off the
+    # event loop, so identical requests can join meanwhile, and on its own
+    # session, since it may outlive this request's `db`
+    return await single_flight.run(
+        "get_table_by_id", {"id": id}, lambda: asyncio.to_thread(lookup, read_session_like(db))
+    )
+
+
 def get_all_tables(db: Session):
     tables = db.query(MetaTable).all()
     if not tables:
         raise HTTPException(status_code=404, detail="No tables found")
-    return tables
\ No newline at end of file
+    return tables
+
+
+def _segment_path_filter(segment_path: list):
+    """
+    Turns a segment path such as ["Hardware", "Servers"] into the nested
+    object {"Hardware": {"Servers": {}}}, which a dataset's
+    `segment_subsegment` tree contains (`@>`) when it has that path.
+    """
+    nested = {}
+    for segment in reversed(segment_path):
+        nested = {segment: nested}
+    return nested
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+
+
+def search_tables(
+    db: Session,
+    region: str = None,
+    segment_path: list = None,
+    start_year: int = None,
+    end_year: int = None,
+    market: str = None,
+    limit: int = 50,
+    after: str = None,
+):
+    """
+    Searches the dataset catalog.
+
+    Every filter is served by an index on `meta_table`: GIN containment on
+    `region` and `segment_subsegment`, a btree on the year range and a prefix
+    index on `lower(market_name)`. Results are ordered by id and paged with
+    a keyset cursor: pass the returned `next_cursor` as `after`.
+
+    Datasets uploaded before market names were stored carry a name derived
+    from their table name (lowercase, punctuation lost), so `market` matches
+    them only approximately.
+    """
+    query = db.query(MetaTable)
+
+    if region:
+        query = query.filter(MetaTable.region.contains([region]))
+    if segment_path:
+        query = query.filter(MetaTable.segment_subsegment.contains(_segment_path_filter(segment_path)))
+
+    # Datasets whose year range overlaps the requested one
+    if start_year is not None:
+        query = query.filter(MetaTable.end_year >= start_year)
+    if end_year is not None:
+        query = query.filter(MetaTable.start_year <= end_year)
+
+    if market:
+        pattern = f"{_escape_like(market.strip().lower())}%"
+        query = query.filter(func.lower(MetaTable.market_name).like(pattern, escape="!"))
+
+    if after:
+        query = query.filter(MetaTable.id > after)
+
+    # Fetch one extra row to know whether another page exists
+    tables = query.order_by(MetaTable.id).limit(limit + 1).all()
+    has_more = len(tables) > limit
+    tables = tables[:limit]
+
+    return {
+        "items": tables,
+        "next_cursor": tables[-1].id if has_more else None,
+    }
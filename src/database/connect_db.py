@@ -1,17 +1,191 @@
-from sqlalchemy import create_engine
+import itertools
+import logging
+import os
+import threading
+import time
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, Session, declarative_base
-from src.config.config import DATABASE_URL
+from src.config.config import (
+    DATABASE_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_RECYCLE,
+    DATABASE_REPLICA_URLS,
+    REPLICA_MAX_LAG_SECONDS,
+    REPLICA_HEALTH_CHECK_INTERVAL,
+    DATABASE_SHARD_URLS,
+)
+from src.services.query_monitor import install_query_monitor
+from src.services.query_cancellation import install_query_cancellation
+
+logger = logging.getLogger(__name__)
 
 DATABASE_URL =  DATABASE_URL
 
-engine = create_engine(DATABASE_URL)  # ✅ Sync engine
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+install_query_monitor()
+install_query_cancellation()
+
+def _create_engine(url: str, **kwargs):
+    return create_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+        **kwargs,
+    )
+
+engine = _create_engine(DATABASE_URL)  # ✅ Sync engine (primary)
+
+# Replicas fail fast so that an unreachable one is skipped, not waited on
+replica_engines = [_create_engine(url, connect_args={"connect_timeout": 2}) for url in DATABASE_REPLICA_URLS]
+
+# The primary holds the catalog (users, meta_table) and is also the "default"
+# dataset shard; every other shard only holds dataset tables.
+DEFAULT_SHARD = "default"
+shard_engines = {
+    DEFAULT_SHARD: engine,
+    **{name: _create_engine(url) for name, url in DATABASE_SHARD_URLS.items() if name != DEFAULT_SHARD},
+}
 
 Base = declarative_base()
 
+def _reset_pool_after_fork():
+    """
+    Drops connections inherited from a parent process so that forked workers
+    never share a socket; each child opens its own pool lazily.
+    """
+    for pooled_engine in {engine, *replica_engines, *shard_engines.values()}:
+        pooled_engine.dispose(close=False)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_pool_after_fork)
+
+# ----------------------------------------
+# Dataset Shards
+# ----------------------------------------
+
+def shard_engine(shard: str = None):
+    """Engine of a dataset shard; None is the default shard."""
+    try:
+        return shard_engines[shard or DEFAULT_SHARD]
+    except KeyError:
+        raise LookupError(f"Unknown dataset shard '{shard}'")
+
+class ShardedSession(Session):
+    """
+    Session whose dataset statements can be sent to the shard that owns the
+    dataset with `bind_arguments={"shard": table.shard}`. Everything else
+    (ORM queries on the catalog) uses the session's own bind.
+    """
+
+    def get_bind(self, mapper=None, clause=None, shard=None, **kwargs):
+        if shard and shard != DEFAULT_SHARD:
+            return shard_engine(shard)
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
+SessionLocal = sessionmaker(class_=ShardedSession, bind=engine, autoflush=False, autocommit=False)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+# ----------------------------------------
+# Replica Health
+# ----------------------------------------
+
+_replica_health = {}  # replica index -> (healthy, checked_at)
+_replica_health_lock = threading.Lock()
+_replica_cycle = itertools.count()
+
+_REPLICA_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+def _check_replica(replica) -> bool:
+    """A replica is healthy when reachable and replaying within `REPLICA_MAX_LAG_SECONDS`."""
+    try:
+        with replica.connect() as connection:
+            lag = float(connection.execute(_REPLICA_LAG_QUERY).scalar())
+        return lag <= REPLICA_MAX_LAG_SECONDS
+    except Exception as e:
+        logger.warning("Read replica %s is unavailable: %s", replica.url.host, e)
+        return False
+
+def _is_replica_healthy(index: int) -> bool:
+    now = time.monotonic()
+    with _replica_health_lock:
+        healthy, checked_at = _replica_health.get(index, (False, None))
+        if checked_at is not None and now - checked_at < REPLICA_HEALTH_CHECK_INTERVAL:
+            return healthy
+        # Claim this check so concurrent callers reuse the previous result
+        _replica_health[index] = (healthy, now)
+
+    healthy = _check_replica(replica_engines[index])
+    with _replica_health_lock:
+        _replica_health[index] = (healthy, time.monotonic())
+    return healthy
+
+def pick_replica():
+    """
+    Returns a healthy replica engine (round robin), or None so the caller
+    falls back to the primary.
+    """
+    if not replica_engines:
+        return None
+
+    start = next(_replica_cycle)
+    for offset in range(len(replica_engines)):
+        index = (start + offset) % len(replica_engines)
+        if _is_replica_healthy(index):
+            return replica_engines[index]
+    return None
+
+# ----------------------------------------
+# Read Sessions
+# ----------------------------------------
+
+class RoutingSession(ShardedSession):
+    """
+    Session for read-only routes. Statements go to the replica chosen when
+    the session was opened, unless `use_primary()` pinned it to the primary.
+    Datasets on other shards are read from that shard's primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, shard=None, **kwargs):
+        if shard and shard != DEFAULT_SHARD:
+            return shard_engine(shard)
+        replica = self.info.get("replica")
+        if replica is None or self.info.get("use_primary"):
+            return engine
+        return replica
+
+ReadSessionLocal = sessionmaker(class_=RoutingSession, autoflush=False, autocommit=False)
+
+def reads_from_replica(db: Session) -> bool:
+    return isinstance(db, RoutingSession) and db.get_bind() is not engine
+
+def use_primary(db: Session):
+    """Routes the rest of this session to the primary (read-your-writes)."""
+    db.info["use_primary"] = True
+
+def read_session_like(db: Session):
+    """
+    Opens a new read session routed like `db` (same replica, same primary
+    pin), for work that may outlive `db`'s request. The caller closes it.
+    """
+    return ReadSessionLocal(info={"replica": db.info.get("replica"), "use_primary": db.info.get("use_primary", False)})
+
+def get_read_db():
+    db = ReadSessionLocal(info={"replica": pick_replica()})
+    try:
+        yield db
+    finally:
+        db.close()
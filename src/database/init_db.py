@@ -0,0 +1,126 @@
+import re
+from sqlalchemy import text
+from src.database.connect_db import Base, engine
+
+# Import every model so that it is registered on `Base.metadata`
+from src.models import meta_table_model, user_model  # noqa: F401
+
+# Arbitrary application-wide key for pg_advisory_xact_lock: every worker runs
+# create_schema() on startup, and only one may migrate at a time
+_SCHEMA_LOCK_KEY = 7_245_001
+
+# ----------------------------------------
+# Migrations
+# ----------------------------------------
+
+def _column_type(connection, table: str, column: str):
+    return connection.execute(text("""
+        SELECT data_type
+        FROM information_schema.columns
+        WHERE table_name = :table AND column_name = :column
+    """), {"table": table, "column": column}).scalar()
+
+
+def _legacy_market_name(table_name: str, regions) -> str:
+    """
+    Approximates the market name of a dataset loaded before `market_name`
+    was stored, from its table name "<region>_<market name>_<uuid8>" (both
+    parts lowercased with non-word characters turned into "_").
+
+    Example:
+        Input:  "global_electric_vehicle_battery_1a2b3c4d"
+        Output: "electric vehicle battery"
+
+    The region prefix is the 'Home' sheet region, which is usually, but not
+    always, one of the dataset's regions; when none matches, the first word
+    is taken as the region. Punctuation and case of the original name are lost.
+    """
+    stem = re.sub(r"_[0-9a-f]{8}$", "", table_name)
+
+    prefixes = sorted(
+        (re.sub(r"\W+", "_", str(region).strip()).lower() + "_" for region in regions or []),
+        key=len,
+        reverse=True,
+    )
+    prefix = next((prefix for prefix in prefixes if stem.startswith(prefix)), None)
+    stem = stem[len(prefix):] if prefix else stem.partition("_")[2] or stem
+
+    return stem.replace("_", " ").strip()
+
+
+def _backfill_market_names(connection):
+    # Rows with no market name, or with the table-name stem an earlier
+    # version of this migration stored there
+    rows = connection.execute(text("""
+        SELECT id, table_name, region
+        FROM meta_table
+        WHERE market_name IS NULL
+        OR market_name = regexp_replace(table_name, '_[0-9a-f]{8}$', '')
+    """)).fetchall()
+
+    for table_id, table_name, regions in rows:
+        connection.execute(
+            text("UPDATE meta_table SET market_name = :market_name WHERE id = :id"),
+            {"id": table_id, "market_name": _legacy_market_name(table_name, regions)},
+        )
+
+
+def migrate_schema(connection):
+    """
+    Brings an existing `meta_table` up to the current model. Every step is
+    idempotent, so it is safe to run on each deploy, and a step whose work is
+    already done issues no DDL (no ACCESS EXCLUSIVE lock on a live table).
+
+    - `region` (JSON text in a VARCHAR) and `segment_subsegment` (JSON) become
+      JSONB, converting the existing rows in place.
+    - `market_name` is added and, for legacy rows, backfilled with an
+      approximation derived from the table name (see `_legacy_market_name`).
+    - `shard` is added; existing datasets (NULL) live on the default shard.
+    - GIN / btree indexes used by catalog search are created.
+    """
+    if _column_type(connection, "meta_table", "region") != "jsonb":
+        connection.execute(text(
+            "ALTER TABLE meta_table ALTER COLUMN region TYPE JSONB USING region::jsonb"
+        ))
+
+    if _column_type(connection, "meta_table", "segment_subsegment") != "jsonb":
+        connection.execute(text(
+            "ALTER TABLE meta_table ALTER COLUMN segment_subsegment TYPE JSONB "
+            "USING segment_subsegment::jsonb"
+        ))
+
+    for column in ("market_name", "shard"):
+        if _column_type(connection, "meta_table", column) is None:
+            connection.execute(text(f"ALTER TABLE meta_table ADD COLUMN {column} VARCHAR"))
+
+    _backfill_market_names(connection)
+
+    for index in meta_table_model.MetaTable.__table__.indexes:
+        index.create(connection, checkfirst=True)
+
+# ----------------------------------------
+# Schema Creation
+# ----------------------------------------
+
+def create_schema():
+    """
+    Creates any missing application tables and migrates existing ones.
+
+    Runs from the app lifespan when `AUTO_CREATE_SCHEMA` is enabled, or as an
+    explicit deployment step:
+
+        python -m src.database.init_db
+
+    Everything runs in one transaction under an advisory lock, so workers
+    starting together migrate one after another; the later ones find
+    nothing left to do.
+    """
+    with engine.begin() as connection:
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _SCHEMA_LOCK_KEY})
+        Base.metadata.create_all(bind=connection)
+        migrate_schema(connection)
+
+
+if __name__ == "__main__":
+    create_schema()
+    print("Database schema is up to date.")
@@ -0,0 +1,174 @@
+import argparse
+import tempfile
+import time
+from sqlalchemy import text
+from src.config.config import REPLICA_MAX_LAG_SECONDS
+from src.database.connect_db import DEFAULT_SHARD, SessionLocal, shard_engine, shard_engines
+from src.models.meta_table_model import MetaTable
+from src.services.db_operations import create_indexes, create_table
+
+# Rows are spooled to disk beyond this size while being copied between shards
+_SPOOL_MAX_MEMORY = 64 * 1024 * 1024
+
+# ----------------------------------------
+# Copy
+# ----------------------------------------
+
+def _dataset_columns(source, table_name: str) -> list:
+    with source.connect() as connection:
+        return list(connection.execute(text(f'SELECT * FROM "{table_name}" LIMIT 0')).keys())
+
+
+def _table_exists(bind, table_name: str) -> bool:
+    with bind.connect() as connection:
+        return connection.execute(text("SELECT to_regclass(:table) IS NOT NULL"), {"table": f'"{table_name}"'}).scalar()
+
+
+def _row_count(bind, table_name: str) -> int:
+    with bind.connect() as connection:
+        return connection.execute(text(f'SELECT COUNT(*) FROM "{table_name}"')).scalar()
+
+
+def _copy_table(source, target, table_id: str, table_name: str, columns: list):
+    """
+    Recreates the table on `target` and copies every row (ids included) with
+    binary COPY. The target table is created in the same transaction as the
+    COPY, so the rows are written frozen.
+    """
+    import pandas as pd
+
+    column_list = ", ".join([f'"{col}"' for col in columns])
+    layout = pd.DataFrame(columns=[col for col in columns if col != "id"])
+
+    with tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_MEMORY) as spool:
+        raw_connection = source.raw_connection()
+        try:
+            with raw_connection.cursor() as cursor:
+                cursor.copy_expert(f'COPY "{table_name}" ({column_list}) TO STDOUT WITH (FORMAT binary)', spool)
+            raw_connection.rollback()
+        finally:
+            raw_connection.close()
+        spool.seek(0)
+
+        db = SessionLocal(bind=target)
+        try:
+            create_table(layout, table_name, db)
+            with db.connection().connection.cursor() as cursor:
+                cursor.copy_expert(
+                    f'COPY "{table_name}" ({column_list}) FROM STDIN WITH (FORMAT binary, FREEZE true)', spool
+                )
+            db.execute(text(f"""
+                SELECT setval(pg_get_serial_sequence(:table, 'id'), COALESCE(MAX(id), 1), MAX(id) IS NOT NULL)
+                FROM "{table_name}"
+            """), {"table": f'"{table_name}"'})
+            create_indexes(layout, table_name, table_id, db)
+            db.commit()
+
+            db.execute(text(f'ANALYZE "{table_name}"'))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+def _drop_table(bind, table_name: str):
+    with bind.begin() as connection:
+        connection.execute(text(f'DROP TABLE IF EXISTS "{table_name}"'))
+
+# ----------------------------------------
+# Move
+# ----------------------------------------
+
+def move_dataset(table_id: str, target_shard: str, drain_seconds: float = None, keep_source: bool = False):
+    """
+    Moves a dataset table to another shard while it keeps being served.
+
+    Datasets are never modified after ingest, so the move is:
+    1. Copy the table, its index and statistics to the target shard.
+    2. Check the row counts match.
+    3. Point the MetaTable row at the target (locking the row, and only if
+       it still points at the source). New requests now read the copy.
+    4. Wait `drain_seconds` for requests that resolved the old location
+       (including on lagging read replicas) to finish, then drop the source.
+
+    A failure before step 3 drops the copy made by this run and leaves the
+    dataset where it was. A table that already exists on the target (e.g.
+    left by an earlier move) is never touched: the move refuses to start.
+    """
+    if target_shard not in shard_engines:
+        raise SystemExit(f"Unknown shard '{target_shard}'. Configured: {', '.join(shard_engines)}")
+    if drain_seconds is None:
+        drain_seconds = max(30, 2 * REPLICA_MAX_LAG_SECONDS)
+
+    db = SessionLocal()
+    try:
+        table = db.query(MetaTable).filter(MetaTable.id == table_id).first()
+        if table is None:
+            raise SystemExit(f"Dataset '{table_id}' not found.")
+        table_name = table.table_name
+        source_shard = table.shard or DEFAULT_SHARD
+        db.rollback()
+    finally:
+        db.close()
+
+    if source_shard == target_shard:
+        raise SystemExit(f"Dataset '{table_id}' is already on shard '{target_shard}'.")
+
+    source, target = shard_engine(source_shard), shard_engine(target_shard)
+    if _table_exists(target, table_name):
+        raise SystemExit(f"Table {table_name} already exists on shard '{target_shard}'; check and drop it first.")
+    print(f"Copying {table_name} from '{source_shard}' to '{target_shard}'...")
+
+    started = time.perf_counter()
+    columns = _dataset_columns(source, table_name)
+    # CREATE TABLE fails if a concurrent run got there first, so the copy is
+    # ours to drop only once _copy_table has committed it
+    created = False
+
+    try:
+        _copy_table(source, target, table_id, table_name, columns)
+        created = True
+
+        source_rows, target_rows = _row_count(source, table_name), _row_count(target, table_name)
+        if source_rows != target_rows:
+            raise RuntimeError(f"row count mismatch: {source_rows} on source, {target_rows} on target")
+
+        db = SessionLocal()
+        try:
+            table = db.query(MetaTable).filter(MetaTable.id == table_id).with_for_update().first()
+            if table is None or (table.shard or DEFAULT_SHARD) != source_shard:
+                raise RuntimeError("the dataset was deleted or moved by someone else")
+            table.shard = None if target_shard == DEFAULT_SHARD else target_shard
+            db.commit()
+        finally:
+            db.close()
+
+    except Exception:
+        if created:
+            _drop_table(target, table_name)
+        raise
+
+    print(f"Switched {table_name} to '{target_shard}' ({target_rows} rows, {time.perf_counter() - started:.1f}s).")
+
+    if keep_source:
+        print(f"Kept the source table on '{source_shard}'; drop it once nothing reads it.")
+        return
+
+    print(f"Waiting {drain_seconds:.0f}s for in-flight reads on '{source_shard}'...")
+    time.sleep(drain_seconds)
+    _drop_table(source, table_name)
+    print(f"Dropped {table_name} from '{source_shard}'.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move a dataset to another database shard.")
+    parser.add_argument("table_id")
+    parser.add_argument("target_shard")
+    parser.add_argument("--drain-seconds", type=float, default=None,
+                        help="Wait before dropping the source table (default: max(30, 2 x REPLICA_MAX_LAG_SECONDS))")
+    parser.add_argument("--keep-source", action="store_true", help="Do not drop the source table")
+    args = parser.parse_args()
+
+    move_dataset(args.table_id, args.target_shard, args.drain_seconds, args.keep_source)
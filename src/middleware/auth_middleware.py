@@ -2,6 +2,7 @@ from fastapi import Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from src.database.connect_db import get_db
 from src.utils.utils import decode_access_token, request_cookie
+from src.config.config import ADMIN_EMAILS
 from src.models.user_model import UserModel
 
 # ----------------------------------------
@@ -25,3 +26,12 @@ def get_user_authenticated(req: Request, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="User not found")
 
     return user
+
+
+def get_admin_user(user = Depends(get_user_authenticated)):
+    """Allow only users listed in `ADMIN_EMAILS` (internal diagnostics)."""
+
+    if user.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    return user
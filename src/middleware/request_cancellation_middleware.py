@@ -0,0 +1,95 @@
+import asyncio
+from fastapi.responses import JSONResponse
+from src.config.config import REQUEST_TIMEOUT_DEFAULT
+from src.services.query_cancellation import RequestScope, current_request, is_cancellation
+
+# ----------------------------------------
+# Request Cancellation Middleware
+# ----------------------------------------
+
+def _header_timeout(scope) -> float:
+    """Seconds from the `X-Request-Timeout` header, or None when absent or invalid."""
+    for name, value in scope.get("headers", []):
+        if name == b"x-request-timeout":
+            try:
+                seconds = float(value)
+            except ValueError:
+                return None
+            return seconds if seconds > 0 else None
+    return None
+
+
+class RequestCancellationMiddleware:
+    """
+    Gives each request a deadline and cancels its running database
+    statements when the deadline passes or the client disconnects.
+
+    The deadline is the earliest of the `X-Request-Timeout` header (seconds),
+    `REQUEST_TIMEOUT_DEFAULT` and any `request_timeout()` on the route, so a
+    client can shorten but never extend it. A request that runs out of time
+    gets a 504; one whose client went away gets no response at all.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = RequestScope(asyncio.get_running_loop())
+        request.set_timeout(_header_timeout(scope))
+        request.set_timeout(REQUEST_TIMEOUT_DEFAULT)
+        token = current_request.set(request)
+
+        # Relay incoming messages so a disconnect is noticed even while the
+        # endpoint is not reading; the bounded queue keeps bodies streaming
+        messages = asyncio.Queue(maxsize=1)
+
+        async def relay():
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    request.cancel("disconnect")
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    return
+
+        relay_task = asyncio.create_task(relay())
+        response_started = False
+
+        async def send_wrapper(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                request.completed = True
+            await send(message)
+
+        try:
+            await self.app(scope, messages.get, send_wrapper)
+        except Exception as e:
+            if not is_cancellation(e) or (request.cancelled is None and request.deadline is None):
+                raise
+            if request.cancelled != "disconnect" and not response_started:
+                response = JSONResponse(status_code=504, content={"detail": "Request deadline exceeded"})
+                await response(scope, receive, send)
+        finally:
+            relay_task.cancel()
+            request.close()
+            current_request.reset(token)
+
+# ----------------------------------------
+# Route Deadline Dependency
+# ----------------------------------------
+
+def request_timeout(seconds: float):
+    """Dependency that limits a route (or router) to `seconds` per request."""
+
+    async def apply_request_timeout():
+        request = current_request.get()
+        if request is not None:
+            request.set_timeout(seconds)
+
+    return apply_request_timeout
@@ -0,0 +1,14 @@
+from fastapi import Request
+from src.services.query_monitor import current_route
+
+# ----------------------------------------
+# Request Context
+# ----------------------------------------
+
+async def track_request_route(req: Request):
+    """
+    Records the matched route template (e.g. `/api/v1/tables/{id}`) so that
+    database hooks can attribute statements to the route that issued them.
+    """
+    route = req.scope.get("route")
+    current_route.set(f"{req.method} {getattr(route, 'path', req.url.path)}")
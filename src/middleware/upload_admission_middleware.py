@@ -0,0 +1,172 @@
+import asyncio
+import math
+import threading
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from fastapi import Depends, HTTPException, Request
+from src.config.config import (
+    UPLOAD_MAX_CONCURRENT,
+    UPLOAD_MAX_INFLIGHT_BYTES,
+    UPLOAD_QUEUE_SIZE,
+    UPLOAD_QUEUE_TIMEOUT,
+    UPLOAD_RATE_PER_MINUTE,
+    UPLOAD_RATE_BURST,
+    UPLOAD_RETRY_AFTER,
+)
+from src.middleware.auth_middleware import get_user_authenticated
+
+# ----------------------------------------
+# Upload Admission Controller
+# ----------------------------------------
+
+class UploadAdmissionController:
+    """
+    Bounds the ingestion work a worker process accepts.
+
+    - At most `max_concurrent` uploads are processed at once, holding at most
+      `max_bytes` of upload payload between them.
+    - Up to `queue_size` further uploads wait (for at most `queue_timeout`
+      seconds) for a slot; beyond that they are rejected with 429.
+    - Each user gets a token bucket of `burst` uploads refilled at
+      `rate_per_minute`.
+    """
+
+    def __init__(self, max_concurrent, max_bytes, queue_size, queue_timeout, rate_per_minute, burst):
+        self.max_concurrent = max_concurrent
+        self.max_bytes = max_bytes
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.rate_per_second = rate_per_minute / 60
+        self.burst = burst
+
+        self.active = 0
+        self.inflight_bytes = 0
+        self.waiting = 0
+        self.decisions = Counter()
+
+        self._condition = asyncio.Condition()
+        self._buckets = {}  # user_id -> (tokens, updated_at)
+        self._buckets_lock = threading.Lock()
+        self._buckets_swept_at = time.monotonic()
+
+    def _take_token(self, user_id: str) -> float:
+        """Consumes one upload token; returns 0, or the seconds until one is available."""
+        if self.rate_per_second <= 0:
+            return 0
+
+        now = time.monotonic()
+        with self._buckets_lock:
+            self._evict_full_buckets(now)
+            tokens, updated_at = self._buckets.get(user_id, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate_per_second)
+            if tokens < 1:
+                self._buckets[user_id] = (tokens, now)
+                return (1 - tokens) / self.rate_per_second
+            self._buckets[user_id] = (tokens - 1, now)
+            return 0
+
+    def _evict_full_buckets(self, now: float):
+        # A bucket that has refilled to `burst` is the same as no bucket; drop
+        # those once per refill period so idle users do not accumulate
+        refill_seconds = self.burst / self.rate_per_second
+        if now - self._buckets_swept_at < refill_seconds:
+            return
+        self._buckets_swept_at = now
+        self._buckets = {
+            user_id: (tokens, updated_at)
+            for user_id, (tokens, updated_at) in self._buckets.items()
+            if tokens + (now - updated_at) * self.rate_per_second < self.burst
+        }
+
+    def _has_capacity(self, nbytes: int) -> bool:
+        # A lone upload is always admitted so that one larger than the byte budget can still run
+        return self.active == 0 or (
+            self.active < self.max_concurrent and self.inflight_bytes + nbytes <= self.max_bytes
+        )
+
+    def _reject(self, reason: str, detail: str, retry_after: float):
+        self.decisions[reason] += 1
+        raise HTTPException(
+            status_code=429,
+            detail=detail,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+    @asynccontextmanager
+    async def admit(self, user_id: str, nbytes: int = 0):
+        """Holds an ingestion slot for the duration of the `async with` block."""
+        retry_after = self._take_token(user_id)
+        if retry_after:
+            self._reject("rejected_rate_limited", "Upload rate limit exceeded", retry_after)
+
+        async with self._condition:
+            if not self._has_capacity(nbytes):
+                if self.waiting >= self.queue_size:
+                    self._reject("rejected_queue_full", "Too many uploads in progress", UPLOAD_RETRY_AFTER)
+
+                self.waiting += 1
+                self.decisions["queued"] += 1
+                try:
+                    await asyncio.wait_for(
+                        self._condition.wait_for(lambda: self._has_capacity(nbytes)),
+                        timeout=self.queue_timeout,
+                    )
+                except asyncio.TimeoutError:
+                    self._reject("rejected_queue_timeout", "Timed out waiting for an upload slot", UPLOAD_RETRY_AFTER)
+                finally:
+                    self.waiting -= 1
+
+            self.active += 1
+            self.inflight_bytes += nbytes
+            self.decisions["admitted"] += 1
+
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.active -= 1
+                self.inflight_bytes -= nbytes
+                self._condition.notify_all()
+
+    def snapshot(self) -> dict:
+        return {
+            "active": self.active,
+            "queue_depth": self.waiting,
+            "inflight_bytes": self.inflight_bytes,
+            "rate_limited_users": len(self._buckets),
+            "limits": {
+                "max_concurrent": self.max_concurrent,
+                "max_inflight_bytes": self.max_bytes,
+                "queue_size": self.queue_size,
+                "queue_timeout": self.queue_timeout,
+                "rate_per_minute": self.rate_per_second * 60,
+                "burst": self.burst,
+            },
+            "decisions": dict(self.decisions),
+        }
+
+
+upload_admission = UploadAdmissionController(
+    max_concurrent=UPLOAD_MAX_CONCURRENT,
+    max_bytes=UPLOAD_MAX_INFLIGHT_BYTES,
+    queue_size=UPLOAD_QUEUE_SIZE,
+    queue_timeout=UPLOAD_QUEUE_TIMEOUT,
+    rate_per_minute=UPLOAD_RATE_PER_MINUTE,
+    burst=UPLOAD_RATE_BURST,
+)
+
+# ----------------------------------------
+# Upload Admission Dependency
+# ----------------------------------------
+
+async def admit_upload(req: Request, user = Depends(get_user_authenticated)):
+    """
+    Admits the current upload or rejects it with 429 and `Retry-After`.
+
+    It can only hold back the request body on routes without File()/Form()
+    parameters: FastAPI receives those before it runs any dependency.
+    """
+    nbytes = int(req.headers.get("content-length") or 0)
+    async with upload_admission.admit(user.id, nbytes):
+        yield
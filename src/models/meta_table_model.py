@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, func, JSON
+from sqlalchemy import Column, Integer, String, DateTime, func, Index, text
+from sqlalchemy.dialects.postgresql import JSONB
 from src.database.connect_db import Base
 
 class MetaTable(Base):
@@ -6,8 +7,19 @@ class MetaTable(Base):
 
     id = Column(String, primary_key=True, index=True)
     table_name = Column(String, unique=True, nullable=False)
-    region = Column(String)
-    segment_subsegment = Column(JSON)
+    market_name = Column(String)
+    shard = Column(String)  # Database holding the dataset table; NULL = default shard
+    region = Column(JSONB)
+    segment_subsegment = Column(JSONB)
     start_year = Column(Integer)
     end_year = Column(Integer)
-    created_at = Column(DateTime, default=func.now())
\ No newline at end of file
+    created_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        # Containment lookups (`@>`) for catalog search
+        Index("ix_meta_table_region", "region", postgresql_using="gin"),
+        Index("ix_meta_table_segment_subsegment", "segment_subsegment", postgresql_using="gin"),
+        Index("ix_meta_table_years", "start_year", "end_year"),
+        # Case-insensitive prefix search on market name
+        Index("ix_meta_table_market_name", text("lower(market_name) text_pattern_ops")),
+    )
@@ -1,9 +1,14 @@
+from functools import lru_cache
 from sqlalchemy import Column, String, Boolean, DateTime, func
 from sqlalchemy.sql import func
 from src.database.connect_db import Base
-from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+@lru_cache(maxsize=1)
+def get_pwd_context():
+    # passlib/bcrypt are only needed by the auth routes, so load them on first use
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 class UserModel(Base):
@@ -21,7 +26,7 @@ class UserModel(Base):
 
 
     def hash_password(password: str):
-        return pwd_context.hash(password)
+        return get_pwd_context().hash(password)
     
     def verify_password(plain_password:str, hashed_password:str):
-        return pwd_context.verify(plain_password, hashed_password)
+        return get_pwd_context().verify(plain_password, hashed_password)
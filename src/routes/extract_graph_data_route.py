@@ -1,14 +1,14 @@
 from fastapi import Depends, APIRouter, HTTPException
 from sqlalchemy.orm import Session
-from src.database.connect_db import get_db
-from src.controllers.extract_graph_data_controller import extract_graph_data,extract_section_graph_data,get_regions
-from src.schemas.extract_graph_data_schema import ExtractGraphDataSchema,GetRegionsSchema
+from src.database.connect_db import get_read_db
+from src.controllers.extract_graph_data_controller import extract_graph_data,extract_section_graph_data,get_regions,compare_graph_data
+from src.schemas.extract_graph_data_schema import ExtractGraphDataSchema,GetRegionsSchema,CompareGraphDataSchema
 
 
 router = APIRouter()
 
 @router.post("/extract-graph-data")
-async def extract_graph_data_router(req:ExtractGraphDataSchema, db:Session = Depends(get_db)):
+async def extract_graph_data_router(req:ExtractGraphDataSchema, db:Session = Depends(get_read_db)):
     """
     Extracts data from the database for graph plotting.
     """
@@ -19,7 +19,7 @@ async def extract_graph_data_router(req:ExtractGraphDataSchema, db:Session = Dep
 
 
 @router.post("/extract-section-graph-data")
-async def extract_section_graph_data_router(req:ExtractGraphDataSchema, db:Session = Depends(get_db)):
+async def extract_section_graph_data_router(req:ExtractGraphDataSchema, db:Session = Depends(get_read_db)):
     """
     Extracts data from the database for section graph plotting.
     """
@@ -30,9 +30,16 @@ async def extract_section_graph_data_router(req:ExtractGraphDataSchema, db:Sessi
 
 
 @router.post("/get-regions")
-async def get_regions_router(req:GetRegionsSchema,db:Session = Depends(get_db)):
+async def get_regions_router(req:GetRegionsSchema,db:Session = Depends(get_read_db)):
     """
     Retrieves all regions from the database.
     """
     return await get_regions(req.table_id,db)
 
+
+@router.post("/compare-graph-data")
+async def compare_graph_data_router(req:CompareGraphDataSchema, db:Session = Depends(get_read_db)):
+    """
+    Compares one region/segment across several datasets as a single year-aligned series.
+    """
+    return await compare_graph_data(req,db)
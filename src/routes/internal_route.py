@@ -0,0 +1,73 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from src.database.connect_db import get_db
+from src.services.query_monitor import get_slow_queries, reset_slow_queries
+from src.middleware.upload_admission_middleware import upload_admission
+from src.services.columnar_engine import columnar_engine
+from src.services.shard_placement import shard_usage
+from src.services.query_cancellation import get_cancellation_stats
+from src.services.single_flight import single_flight
+
+router = APIRouter()
+
+@router.get("/slow-queries")
+async def get_slow_queries_router(
+    limit: int = Query(20, ge=1, le=500),
+    order_by: str = Query("total_ms", pattern="^(total_ms|avg_ms|max_ms|count)$"),
+):
+    """
+    Lists the slowest statement shapes recorded by the slow query log,
+    with literals normalized away.
+    """
+    return get_slow_queries(limit, order_by)
+
+
+@router.delete("/slow-queries")
+async def reset_slow_queries_router():
+    """
+    Clears the recorded slow query statistics.
+    """
+    reset_slow_queries()
+    return {"message": "Slow query statistics cleared"}
+
+
+@router.get("/upload-admission")
+async def get_upload_admission_router():
+    """
+    Current upload queue depth, in-flight work and admission decisions for this worker.
+    """
+    return upload_admission.snapshot()
+
+
+@router.get("/columnar-engine")
+async def get_columnar_engine_router():
+    """
+    Cache usage and hit/fallback counters of the in-process columnar engine.
+    """
+    return columnar_engine.snapshot()
+
+
+@router.get("/query-cancellation")
+async def get_query_cancellation_router():
+    """
+    Requests cancelled by deadline or client disconnect, and the statements
+    cancelled, timed out or refused because of them, for this worker.
+    """
+    return get_cancellation_stats()
+
+
+@router.get("/single-flight")
+async def get_single_flight_router():
+    """
+    Executions of coalesced controller calls and how many were saved by
+    sharing an in-flight one, for this worker.
+    """
+    return single_flight.snapshot()
+
+
+@router.get("/shards")
+def get_shards_router(db: Session = Depends(get_db)):
+    """
+    Configured dataset shards with their dataset counts and database sizes.
+    """
+    return shard_usage(db)
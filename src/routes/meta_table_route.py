@@ -1,16 +1,47 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from src.database.connect_db import get_db
-from src.controllers.meta_table_controller import get_table_by_id, get_all_tables
+from src.database.connect_db import get_read_db
+from src.controllers.meta_table_controller import get_table_by_id, get_all_tables, search_tables
+from src.controllers.export_controller import export_dataset
 
 router = APIRouter()
 
+@router.get("/tables/search")
+async def search_tables_router(
+    region: str = None,
+    segment: List[str] = Query(None, description="Segment path, outermost first; repeat for each level"),
+    start_year: int = None,
+    end_year: int = None,
+    market: str = Query(None, description="Market name prefix (case-insensitive)"),
+    limit: int = Query(50, ge=1, le=200),
+    after: str = Query(None, description="`next_cursor` from the previous page"),
+    db: Session = Depends(get_read_db),
+):
+    """
+    Finds datasets covering a region, segment path, year range and/or market.
+    """
+    return search_tables(db, region, segment, start_year, end_year, market, limit, after)
+
 @router.get("/tables/{id}")
-async def get_table_by_id_router(id: str, db: Session = Depends(get_db)):
+async def get_table_by_id_router(id: str, db: Session = Depends(get_read_db)):
     if not id:
         raise HTTPException(status_code=400, detail="Table ID is required.")
-    return get_table_by_id(id,db)
+    return await get_table_by_id(id,db)
 
 @router.get("/tables")
-async def get_all_tables_router(db: Session = Depends(get_db)):
+async def get_all_tables_router(db: Session = Depends(get_read_db)):
     return get_all_tables(db)
+
+@router.get("/tables/{id}/export")
+async def export_table_router(
+    id: str,
+    format: str = Query("csv", description="csv, parquet or arrow"),
+    region: str = None,
+    segment: str = None,
+    db: Session = Depends(get_read_db),
+):
+    """
+    Streams the raw rows of a dataset, optionally filtered by region and segment.
+    """
+    return export_dataset(id, format.lower(), region, segment, db)
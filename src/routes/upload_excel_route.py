@@ -1,32 +1,148 @@
-from fastapi import UploadFile, File, Depends, APIRouter, HTTPException
+from fastapi import UploadFile, Depends, APIRouter, HTTPException, Header, Request
 from sqlalchemy.orm import Session
+from starlette.datastructures import UploadFile as FormFile
 from src.database.connect_db import get_db
-from src.services.excel_processor import process_and_store_excel,process_zip_file
-import magic
+from src.middleware.auth_middleware import get_user_authenticated
+from src.middleware.upload_admission_middleware import admit_upload, upload_admission
+from src.schemas.upload_session_schema import CreateUploadSessionSchema
+from src.services.upload_sessions import upload_sessions
 
 
 router = APIRouter()
 
-@router.post("/upload-file/")
-async def upload_file(file: UploadFile = File(...), db: Session = Depends(get_db)):
+_MAGIC_HEADER_BYTES = 2048
+
+async def _store_upload(file: UploadFile, db: Session, shard: str = None, path: str = None):
     """
-    Handles both direct Excel file uploads and ZIP file uploads containing Excel files.
+    Validates an uploaded Excel or ZIP file and hands it to the ingestion pipeline.
+
+    The file is read from `file.file` (or `path`, when it is on disk), so it
+    never has to be held in memory as a whole.
     """
-    file_ext = file.filename.lower().split(".")[-1]
+    # pandas/openpyxl/libmagic are heavy; import them only when an upload arrives
+    import magic
+    from src.services.excel_processor import process_and_store_excel,process_zip_file
 
-    # Read file contents for validation
-    contents = await file.read()
+    file_ext = file.filename.lower().split(".")[-1]
 
-    # Validate MIME type
-    mime = magic.Magic(mime=True)
-    file_type = mime.from_buffer(contents)
+    # Validate MIME type (libmagic only needs the start of the file)
+    if path:
+        file_type = magic.from_file(path, mime=True)
+    else:
+        file_type = magic.from_buffer(file.file.read(_MAGIC_HEADER_BYTES), mime=True)
+        file.file.seek(0)
 
     if file_ext in ["xls", "xlsx"]:
         # Process a single Excel file
-        return await process_and_store_excel(file, contents, db)
+        return await process_and_store_excel(file, db, shard)
 
     elif file_ext == "zip" and file_type == "application/zip":
-        return await process_zip_file(contents, db)
+        return await process_zip_file(path or file.file, db, shard)
 
     else:
-        raise HTTPException(status_code=400, detail="Only ZIP or Excel files are allowed")
\ No newline at end of file
+        raise HTTPException(status_code=400, detail="Only ZIP or Excel files are allowed")
+
+
+# The form is parsed in the endpoint (see upload_file), so document it by hand
+_UPLOAD_FORM = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {
+                        "file": {"type": "string", "format": "binary"},
+                        "shard": {"type": "string"},
+                    },
+                },
+            },
+        },
+    },
+}
+
+
+@router.post("/upload-file/", dependencies=[Depends(admit_upload)], openapi_extra=_UPLOAD_FORM)
+async def upload_file(request: Request, db: Session = Depends(get_db)):
+    """
+    Handles both direct Excel file uploads and ZIP file uploads containing Excel files.
+
+    `shard` places the new datasets on a specific database shard; without it
+    the `SHARD_PLACEMENT` policy decides.
+
+    The multipart body is read here rather than declared with File()/Form():
+    FastAPI receives declared form fields before running any dependency, and
+    `admit_upload` has to refuse an upload before its bytes are received.
+    """
+    async with request.form() as form:
+        file = form.get("file")
+        if not isinstance(file, FormFile):
+            raise HTTPException(status_code=422, detail="A 'file' form field is required")
+
+        # Larger files are spooled to disk by the form parser and read from there
+        return await _store_upload(file, db, form.get("shard") or None)
+
+# ----------------------------------------
+# Resumable Uploads
+# ----------------------------------------
+# 1. POST   /uploads                              -> upload_id
+# 2. PUT    /uploads/{upload_id}/chunks/{n}       (X-Upload-Offset, X-Chunk-SHA256)
+# 3. GET    /uploads/{upload_id}                  -> committed offset, to resume after a drop
+# 4. POST   /uploads/{upload_id}/finalize         -> same result as /upload-file/
+
+@router.post("/uploads")
+async def create_upload_session(req: CreateUploadSessionSchema, user = Depends(get_user_authenticated)):
+    """
+    Starts a resumable upload of an Excel or ZIP file of `size` bytes.
+    """
+    return upload_sessions.create(user.id, req.filename, req.size, req.sha256, req.shard)
+
+
+@router.get("/uploads/{upload_id}")
+async def get_upload_session(upload_id: str, user = Depends(get_user_authenticated)):
+    """
+    Returns the committed offset and next chunk number of an upload.
+    """
+    return upload_sessions.status(upload_id, user.id)
+
+
+@router.put("/uploads/{upload_id}/chunks/{chunk_number}")
+async def put_upload_chunk(
+    upload_id: str,
+    chunk_number: int,
+    request: Request,
+    offset: int = Header(..., alias="X-Upload-Offset"),
+    sha256: str = Header(..., alias="X-Chunk-SHA256"),
+    user = Depends(get_user_authenticated),
+):
+    """
+    Appends one chunk (the raw request body) at the committed offset.
+    """
+    return await upload_sessions.write_chunk(upload_id, user.id, chunk_number, offset, sha256, request.stream())
+
+
+@router.post("/uploads/{upload_id}/finalize")
+async def finalize_upload_session(upload_id: str, user = Depends(get_user_authenticated), db: Session = Depends(get_db)):
+    """
+    Processes a fully received upload through the regular ingestion pipeline
+    and removes it. A failed upload is kept until it expires, so finalizing
+    can be retried.
+    """
+    async with upload_sessions.completed_file(upload_id, user.id) as (meta, path):
+        async with upload_admission.admit(user.id, meta["size"]):
+            with open(path, "rb") as f:
+                file = UploadFile(filename=meta["filename"], file=f)
+                result = await _store_upload(file, db, meta["shard"], path)
+
+    upload_sessions.delete(upload_id)
+    return result
+
+
+@router.delete("/uploads/{upload_id}")
+async def delete_upload_session(upload_id: str, user = Depends(get_user_authenticated)):
+    """
+    Abandons an upload and frees its disk space.
+    """
+    upload_sessions.delete(upload_id, user.id)
+    return {"message": "Upload session deleted"}
@@ -1,8 +1,21 @@
+from typing import List, Optional
 from pydantic import BaseModel
 
 class ExtractGraphDataSchema(BaseModel):
     table_id: str
     region: str
+    start_year: Optional[int] = None
+    end_year: Optional[int] = None
+    segments: Optional[List[str]] = None  # Only aggregate these values of `level`
+    level: str = "segment"  # Hierarchy column to group by, e.g. "sub_segment"
 
 class GetRegionsSchema(BaseModel):
     table_id: str
+
+class CompareGraphDataSchema(BaseModel):
+    table_ids: List[str]
+    region: str
+    segment: Optional[str] = None  # Value of `level` to compare; None sums all segments
+    level: str = "segment"
+    start_year: Optional[int] = None
+    end_year: Optional[int] = None
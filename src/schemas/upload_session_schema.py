@@ -0,0 +1,8 @@
+from typing import Optional
+from pydantic import BaseModel
+
+class CreateUploadSessionSchema(BaseModel):
+    filename: str  # .xls, .xlsx or .zip
+    size: int  # Total size of the file in bytes
+    sha256: Optional[str] = None  # Hex digest of the whole file, checked on finalize
+    shard: Optional[str] = None  # Place the datasets on this shard
@@ -0,0 +1,69 @@
+"""
+Production entry point.
+
+Runs the API under uvicorn with several worker processes. Each worker is a
+freshly spawned interpreter, so its engine and connection pool are created
+after the process starts and are never shared with the parent or siblings.
+
+Usage:
+    python -m src.server --role read --workers 8 --port 8000
+    python -m src.server --role ingest --workers 2 --port 8001 --max-requests 200
+
+Run one launcher per role and route `/api/v1/upload-file/` to the ingest
+pool, so CPU-heavy parsing never competes with dashboard reads.
+"""
+import argparse
+import os
+from dotenv import load_dotenv
+
+# Nothing from src.config may be imported here: with --workers 1 uvicorn loads
+# the app in this very process, and config values are read once at import, so
+# they must see the environment as set by main() below.
+load_dotenv()
+
+ROLES = ("all", "read", "ingest")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the TMR API with multiple worker processes.")
+    parser.add_argument("--role", choices=ROLES, default=os.getenv("SERVER_ROLE", "all").lower(),
+                        help="Which routes this worker pool serves (default: SERVER_ROLE)")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_WORKERS", str(os.cpu_count() or 1))),
+                        help="Number of worker processes (default: WEB_WORKERS)")
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.getenv("WEB_GRACEFUL_TIMEOUT", "30")),
+                        help="Seconds to let in-flight requests finish on shutdown")
+    parser.add_argument("--max-requests", type=int, default=int(os.getenv("WEB_MAX_REQUESTS", "0")),
+                        help="Recycle a worker after this many requests (0 = never)")
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "info"))
+    args = parser.parse_args(argv)
+    # argparse does not check defaults against `choices`
+    if args.role not in ROLES:
+        parser.error(f"SERVER_ROLE must be one of {', '.join(ROLES)} (got '{args.role}')")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Workers are spawned, not forked: they inherit the environment, not the
+    # parent's objects, so the role must travel through the environment.
+    # Set it before anything imports src.config (see the note at the top).
+    os.environ["SERVER_ROLE"] = args.role
+
+    import uvicorn
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=max(args.workers, 1),
+        timeout_graceful_shutdown=args.graceful_timeout,
+        limit_max_requests=args.max_requests or None,
+        log_level=args.log_level,
+        proxy_headers=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,444 @@
+import logging
+import sys
+import threading
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP, localcontext
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from src.config.config import COLUMNAR_CACHE_MAX_BYTES, COLUMNAR_MAX_DATASET_BYTES
+
+logger = logging.getLogger(__name__)
+
+# Values are split at 10^-6 into two exact int64 parts: `hi` counts units of
+# 10^-6 and `lo` counts units of 10^-scale below that. Integer sums of both
+# parts are exact, which keeps the results identical to SUM(x::NUMERIC).
+_HI_DIGITS = 6
+_INT64_SAFE = 2 ** 62
+_ROUND_TO = Decimal("0.001")
+
+# Rows fetched per round trip when loading a dataset from Postgres
+_LOAD_BATCH_ROWS = 10000
+
+# ─────────────────────────────────────────────────────────────────
+# COLUMNAR DATASET
+# ─────────────────────────────────────────────────────────────────
+
+class DatasetTooLarge(Exception):
+    """Raised when a dataset cannot be held exactly or within the memory budget."""
+
+
+def _object_bytes(container, values) -> int:
+    """Approximate size of a Python list/dict and the objects it holds."""
+    return sys.getsizeof(container) + sum(sys.getsizeof(value) for value in values)
+
+
+def _parse_numeric(value: str):
+    """Parses a TEXT cell the way `::NUMERIC` would; None for NULL."""
+    if value is None:
+        return None
+    try:
+        number = Decimal(value.strip())
+    except InvalidOperation:
+        raise DatasetTooLarge(f"'{value}' is not numeric")
+    if not number.is_finite():
+        raise DatasetTooLarge(f"'{value}' is not a finite number")
+    return number
+
+
+def _encode_year_column(np, codes, numbers: list, hi_out, lo_out, present_out, column: int, scale: int):
+    """Fills one column of the hi/lo/present matrices from its factorized, parsed values."""
+    hi_uniques = np.zeros(len(numbers) + 1, dtype=np.int64)
+    lo_uniques = np.zeros(len(numbers) + 1, dtype=np.int64)
+    lo_unit = 10 ** max(scale - _HI_DIGITS, 0)
+
+    for i, number in enumerate(numbers):
+        scaled = int(number.scaleb(scale))  # exact: scale covers every value's decimals
+        if scale >= _HI_DIGITS:
+            hi, lo = divmod(scaled, lo_unit)
+        else:
+            hi, lo = scaled * 10 ** (_HI_DIGITS - scale), 0
+        if abs(hi) >= _INT64_SAFE:
+            raise DatasetTooLarge("value out of int64 range")
+        hi_uniques[i], lo_uniques[i] = hi, lo
+
+    # NULL cells (code -1) map to the trailing zero entry
+    codes = np.where(codes < 0, len(numbers), codes)
+    hi_out[:, column] = hi_uniques[codes]
+    lo_out[:, column] = lo_uniques[codes]
+    present_out[:, column] = codes != len(numbers)
+
+
+def _check_scale(rows: int, scale: int):
+    if rows * 10 ** max(scale - _HI_DIGITS, 0) >= _INT64_SAFE:
+        raise DatasetTooLarge("too many decimal places to sum exactly")
+
+
+class ColumnarDataset:
+    """
+    A dataset held as NumPy arrays: dictionary-encoded region and segment
+    columns, and exact fixed-point `year_*` values.
+
+    `ColumnarDataset(frame)` builds one from a whole DataFrame. A dataset
+    read in batches starts from `streamed(columns)`, takes each batch with
+    `append` and is usable after `finish`; every batch is encoded as it
+    arrives, so the text rows are never all held at once.
+    """
+
+    def __init__(self, frame):
+        """
+        Args:
+            frame (DataFrame): The dataset's region, segment and year columns
+                as text, with NULLs as None.
+        """
+        self._start(list(frame.columns))
+        self.append(frame)
+        self.finish()
+
+    @classmethod
+    def streamed(cls, columns: list):
+        """An empty dataset over `columns`, to fill with `append` and `finish`."""
+        dataset = cls.__new__(cls)
+        dataset._start(columns)
+        return dataset
+
+    def _start(self, columns: list):
+        if "region" not in columns:
+            raise DatasetTooLarge("dataset has no region column")
+
+        self.region_index = {}  # value -> code, in order of first appearance
+        self.levels = {col: (None, {}) for col in columns if "segment" in col}
+        self.years = [col for col in columns if col.startswith("year_")]
+        self.year_index = {col: i for i, col in enumerate(self.years)}
+        self.rows = 0
+
+        # One entry per appended batch until `finish` joins them
+        self._label_parts = {col: [] for col in ["region", *self.levels]}
+        self._year_parts = []  # (hi, lo, present, scale)
+
+    def _label_indexes(self):
+        return {"region": self.region_index, **{col: index for col, (_, index) in self.levels.items()}}
+
+    def append(self, frame):
+        """Encodes one batch of rows (a text DataFrame, NULLs as None)."""
+        import numpy as np
+        import pandas as pd
+
+        for col, index in self._label_indexes().items():
+            codes, uniques = pd.factorize(frame[col], use_na_sentinel=True)
+            # Batch codes -> dataset codes; NULL (-1) picks the trailing -1
+            mapping = np.array([index.setdefault(value, len(index)) for value in uniques] + [-1], dtype=np.int32)
+            self._label_parts[col].append(mapping[codes])
+
+        columns = []
+        for col in self.years:
+            codes, uniques = pd.factorize(frame[col], use_na_sentinel=True)
+            columns.append((codes, [_parse_numeric(value) for value in uniques]))
+
+        # The widest scale in the batch decides its `lo` unit; `finish`
+        # brings every batch to the widest scale of the dataset
+        scale = max([0] + [-number.as_tuple().exponent for _, numbers in columns for number in numbers])
+        _check_scale(1, scale)
+
+        rows = len(frame)
+        hi = np.zeros((rows, len(self.years)), dtype=np.int64)
+        lo = np.zeros((rows, len(self.years)), dtype=np.int64)
+        present = np.zeros((rows, len(self.years)), dtype=bool)
+        for i, (codes, numbers) in enumerate(columns):
+            _encode_year_column(np, codes, numbers, hi, lo, present, i, scale)
+
+        self._year_parts.append((hi, lo, present, scale))
+        self.rows += rows
+        return self
+
+    def finish(self):
+        """Joins the appended batches. Returns the dataset."""
+        import numpy as np
+
+        self.scale = max([0] + [scale for *_, scale in self._year_parts])
+        _check_scale(self.rows, self.scale)
+
+        for _, lo, _, scale in self._year_parts:
+            # Exact: lo < 10^(scale - 6), so the result stays below 2^62
+            lo *= 10 ** (max(self.scale, _HI_DIGITS) - max(scale, _HI_DIGITS))
+
+        def join(parts, dtype):
+            return np.concatenate(parts) if parts else np.zeros((0, len(self.years)), dtype=dtype)
+
+        self.hi = join([hi for hi, *_ in self._year_parts], np.int64)
+        self.lo = join([lo for _, lo, *_ in self._year_parts], np.int64)
+        self.present = join([present for *_, present, _ in self._year_parts], bool)
+
+        codes = {
+            col: np.concatenate(parts) if parts else np.zeros(0, dtype=np.int32)
+            for col, parts in self._label_parts.items()
+        }
+        self.region_codes = codes["region"]
+        self.levels = {col: (codes[col], list(index)) for col, (_, index) in self.levels.items()}
+        self._label_parts = self._year_parts = None
+
+        if self.rows and np.abs(self.hi).sum(axis=0).max() >= _INT64_SAFE:
+            raise DatasetTooLarge("column totals out of int64 range")
+
+        # The dictionaries are fixed once built, so their size is measured once
+        self._dictionary_bytes = (
+            _object_bytes(self.region_index, self.region_index)
+            + sum(_object_bytes(values, values) for _, values in self.levels.values())
+            + _object_bytes(self.year_index, self.years)
+        )
+        return self
+
+    @property
+    def nbytes(self) -> int:
+        if self._year_parts is not None:
+            # Still appending: the batches so far and their dictionaries
+            array_bytes = sum(array.nbytes for part in self._year_parts for array in part[:3])
+            label_bytes = sum(codes.nbytes for parts in self._label_parts.values() for codes in parts)
+            dictionary_bytes = sum(_object_bytes(index, index) for index in self._label_indexes().values())
+            return array_bytes + label_bytes + dictionary_bytes
+
+        level_bytes = sum(codes.nbytes for codes, _ in self.levels.values())
+        array_bytes = self.region_codes.nbytes + level_bytes + self.hi.nbytes + self.lo.nbytes + self.present.nbytes
+        return array_bytes + self._dictionary_bytes
+
+    def _to_decimal(self, hi: int, lo: int) -> Decimal:
+        with localcontext() as context:
+            context.prec = 60
+            total = Decimal(hi).scaleb(-_HI_DIGITS) + Decimal(lo).scaleb(-max(self.scale, _HI_DIGITS))
+            # ROUND(x, 3) on NUMERIC rounds half away from zero
+            return total.quantize(_ROUND_TO, rounding=ROUND_HALF_UP)
+
+    def group_sums(self, region: str, level: str, years: list, segments: list = None):
+        """
+        Vectorized equivalent of:
+
+            SELECT {level}, ROUND(SUM(year::NUMERIC), 3) ...
+            FROM table WHERE region = :region [AND {level} IN :segments]
+            GROUP BY {level}
+
+        Returns:
+            List of (group, Decimal | None, ...) tuples, one per group, or
+            None when the level or a year is not part of this dataset.
+        """
+        import numpy as np
+
+        if level not in self.levels or any(year not in self.year_index for year in years):
+            return None
+
+        region_code = self.region_index.get(region)
+        if region_code is None:
+            return []
+
+        level_codes, level_values = self.levels[level]
+        mask = self.region_codes == region_code
+        if segments:
+            segments = set(segments)
+            wanted = [code for code, value in enumerate(level_values) if value in segments]
+            mask &= np.isin(level_codes, wanted)
+
+        rows = np.flatnonzero(mask)
+        if not len(rows):
+            return []
+
+        # NULL group (-1) sorts first, just like any other group
+        groups = level_codes[rows]
+        order = np.argsort(groups, kind="stable")
+        rows, groups = rows[order], groups[order]
+        starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+
+        columns = [self.year_index[year] for year in years]
+        cells = np.ix_(rows, columns)
+        hi_sums = np.add.reduceat(self.hi[cells], starts, axis=0)
+        lo_sums = np.add.reduceat(self.lo[cells], starts, axis=0)
+        counts = np.add.reduceat(self.present[cells].astype(np.int64), starts, axis=0)
+
+        result = []
+        for g, start in enumerate(starts):
+            code = groups[start]
+            group = level_values[code] if code >= 0 else None
+            values = [
+                self._to_decimal(int(hi_sums[g, j]), int(lo_sums[g, j])) if counts[g, j] else None
+                for j in range(len(columns))
+            ]
+            result.append((group, *values))
+        return result
+
+# ─────────────────────────────────────────────────────────────────
+# DATASET CACHE
+# ─────────────────────────────────────────────────────────────────
+
+class ColumnarEngine:
+    """
+    LRU cache of ColumnarDatasets bounded by `max_bytes`. Datasets that do not
+    fit (too large, or not exactly representable) are remembered so their
+    queries go straight to SQL.
+    """
+
+    def __init__(self, max_bytes: int, max_dataset_bytes: int):
+        self.max_bytes = max_bytes
+        self.max_dataset_bytes = max_dataset_bytes
+        self._datasets = OrderedDict()
+        self._rejected = set()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self.stats = {"hits": 0, "loads": 0, "fallbacks": 0, "evictions": 0}
+
+    @property
+    def used_bytes(self) -> int:
+        return sum(dataset.nbytes for dataset in self._datasets.values())
+
+    def _get(self, table_name: str):
+        with self._lock:
+            dataset = self._datasets.get(table_name)
+            if dataset is not None:
+                self._datasets.move_to_end(table_name)
+            return dataset
+
+    def _put(self, table_name: str, dataset: ColumnarDataset):
+        with self._lock:
+            self._datasets[table_name] = dataset
+            self._datasets.move_to_end(table_name)
+            while len(self._datasets) > 1 and self.used_bytes > self.max_bytes:
+                self._datasets.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _reject(self, table_name: str, reason):
+        logger.info("Columnar engine skips %s: %s", table_name, reason)
+        with self._lock:
+            self._rejected.add(table_name)
+
+    def _add(self, table_name: str, dataset: ColumnarDataset):
+        if dataset.nbytes > self.max_dataset_bytes:
+            self._reject(table_name, f"{dataset.nbytes} bytes")
+            return None
+
+        self._put(table_name, dataset)
+        self._count("loads")
+        return dataset
+
+    def add_frame(self, table_name: str, frame):
+        """Builds and caches a dataset from a text DataFrame (e.g. at ingest)."""
+        try:
+            dataset = ColumnarDataset(frame)
+        except DatasetTooLarge as e:
+            self._reject(table_name, e)
+            return None
+        return self._add(table_name, dataset)
+
+    def add_csv(self, table_name: str, buffer, columns: list):
+        """
+        Builds and caches a dataset from the CSV that was just COPYed into
+        the table, so its values are exactly the text Postgres stored.
+        """
+        import pandas as pd
+
+        buffer.seek(0)
+        frame = pd.read_csv(
+            buffer, header=None, names=list(columns), dtype=str,
+            keep_default_na=False,
+            usecols=[col for col in columns if col == "region" or "segment" in col or col.startswith("year_")],
+        )
+        # COPY ... CSV reads an unquoted empty field as NULL
+        frame = frame.astype(object).where(frame != "", None)
+        return self.add_frame(table_name, frame)
+
+    @staticmethod
+    def _row_bytes(columns: list) -> int:
+        years = sum(1 for col in columns if col.startswith("year_"))
+        return 17 * years + 8 * len(columns)
+
+    def _estimated_bytes(self, db: Session, table_name: str, columns: list, shard: str = None):
+        """Size estimate from the planner's row count; None when unknown."""
+        rows = db.execute(
+            text("SELECT reltuples FROM pg_class WHERE relname = :table_name"), {"table_name": table_name},
+            bind_arguments={"shard": shard},
+        ).scalar()
+        # reltuples is -1 for a table that was never vacuumed or analyzed
+        if rows is None or rows < 0:
+            return None
+        return rows * self._row_bytes(columns)
+
+    def _load(self, db: Session, table_name: str, shard: str = None):
+        import pandas as pd
+
+        on_shard = {"shard": shard}
+        columns = [
+            col for col in db.execute(text(f'SELECT * FROM "{table_name}" LIMIT 0'), bind_arguments=on_shard).keys()
+            if col == "region" or "segment" in col or col.startswith("year_")
+        ]
+        estimated = self._estimated_bytes(db, table_name, columns, shard)
+        if estimated is not None and estimated > self.max_dataset_bytes:
+            self._reject(table_name, "estimated size over budget")
+            return None
+
+        # The estimate may be missing or stale: encode batch by batch and
+        # give up as soon as the arrays built so far exceed the budget
+        try:
+            dataset = ColumnarDataset.streamed(columns)
+        except DatasetTooLarge as e:
+            self._reject(table_name, e)
+            return None
+
+        column_list = ", ".join([f'"{col}"' for col in columns])
+        result = db.execute(
+            text(f'SELECT {column_list} FROM "{table_name}"'),
+            bind_arguments=on_shard,
+            execution_options={"stream_results": True},
+        )
+        try:
+            for batch in result.partitions(_LOAD_BATCH_ROWS):
+                dataset.append(pd.DataFrame(batch, columns=columns, dtype=object))
+                if dataset.nbytes > self.max_dataset_bytes:
+                    self._reject(table_name, f"over budget after {dataset.rows} rows")
+                    return None
+            dataset.finish()
+        except DatasetTooLarge as e:
+            self._reject(table_name, e)
+            return None
+        finally:
+            result.close()
+
+        return self._add(table_name, dataset)
+
+    def group_sums(self, db: Session, table_name: str, region: str, level: str, years: list, segments: list = None, shard: str = None):
+        """
+        Answers a graph aggregation from memory, loading the dataset (from
+        `shard`) on first use. Returns None when the caller should fall back
+        to SQL.
+        """
+        if table_name in self._rejected:
+            self._count("fallbacks")
+            return None
+
+        dataset = self._get(table_name)
+        if dataset is None:
+            with self._lock:
+                load_lock = self._load_locks.setdefault(table_name, threading.Lock())
+            with load_lock:
+                dataset = self._get(table_name) or self._load(db, table_name, shard)
+            if dataset is None:
+                self._count("fallbacks")
+                return None
+        else:
+            self._count("hits")
+
+        result = dataset.group_sums(region, level, years, segments)
+        if result is None:
+            self._count("fallbacks")
+        return result
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                **self.stats,
+                "datasets": len(self._datasets),
+                "used_bytes": self.used_bytes,
+                "max_bytes": self.max_bytes,
+                "rejected": len(self._rejected),
+            }
+
+
+columnar_engine = ColumnarEngine(COLUMNAR_CACHE_MAX_BYTES, COLUMNAR_MAX_DATASET_BYTES)
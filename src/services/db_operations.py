@@ -1,25 +1,32 @@
 import io
+import logging
+import time
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 from fastapi.encoders import jsonable_encoder
+from src.database.connect_db import DEFAULT_SHARD, SessionLocal, shard_engine
 from src.models.meta_table_model import MetaTable
 from src.utils.utils import split_date
-import json
+from src.config.config import COLUMNAR_ENGINE_ENABLED
+from src.services.columnar_engine import columnar_engine
+from src.services.shard_placement import choose_shard
+
+logger = logging.getLogger(__name__)
 
 # ─────────────────────────────────────────────────────────────────
 # TABLE CREATION
 # ─────────────────────────────────────────────────────────────────
 
-def create_table(df, table_name: str, db: Session, table_id: str):
+def create_table(df, table_name: str, db: Session):
     """
     Creates a table dynamically based on the given DataFrame columns.
+    Nothing is committed; see `store_dataset`.
 
     Args:
         df (DataFrame): Pandas DataFrame containing column names.
         table_name (str): Name of the new table.
-        db (Session): SQLAlchemy database session.
-        table_id (str): Unique ID for tracking the table in MetaTable.
+        db (Session): Session on the shard that will hold the table.
     """
     column_definitions = ", ".join([f'"{col}" TEXT' for col in df.columns])
     
@@ -30,52 +37,79 @@ def create_table(df, table_name: str, db: Session, table_id: str):
         )
     """
     
-    try:
-        db.execute(text(create_table_query))
-        db.commit()
+    db.execute(text(create_table_query))
 
-        # Register table in MetaTable
-        meta_entry = MetaTable(id=table_id, table_name=table_name)
-        db.add(meta_entry)
-        db.commit()
-        db.refresh(meta_entry)
 
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Error creating table: {str(e)}")
+def register_table(table_id: str, table_name: str, db: Session, market_name: str = None, shard: str = None):
+    """
+    Registers a dataset table in MetaTable (on the catalog). Nothing is committed.
+
+    Args:
+        table_id (str): Unique ID for tracking the table in MetaTable.
+        table_name (str): Name of the dataset table.
+        db (Session): SQLAlchemy session on the catalog database.
+        market_name (str): Market name from the workbook's 'Home' sheet.
+        shard (str): Shard holding the table; None for the default shard.
+    """
+    meta_entry = MetaTable(
+        id=table_id,
+        table_name=table_name,
+        market_name=market_name,
+        shard=None if shard == DEFAULT_SHARD else shard,
+    )
+    db.add(meta_entry)
+    db.flush()
 
 # ─────────────────────────────────────────────────────────────────
 # BULK INSERT USING COPY COMMAND
 # ─────────────────────────────────────────────────────────────────
 
-async def bulk_insert_using_copy(df, table_name: str, db: Session, table_id: str):
+def bulk_insert_using_copy(df, table_name: str, db: Session):
     """
     Efficiently inserts large DataFrame data into the database using COPY.
 
+    The table must have been created in the current transaction: that lets
+    COPY use FREEZE, writing rows already frozen so the first VACUUM does
+    not have to rewrite every page. Nothing is committed.
+
     Args:
         df (DataFrame): Pandas DataFrame containing data.
         table_name (str): Target table name.
         db (Session): SQLAlchemy database session.
-        table_id (str): Unique ID of the table in MetaTable.
     """
     buffer = io.StringIO()
     df.to_csv(buffer, index=False, header=False, sep=',')
     buffer.seek(0)
 
-    try:
-        connection = db.connection()
-        column_names = ", ".join([f'"{col}"' for col in df.columns])
+    connection = db.connection()
+    column_names = ", ".join([f'"{col}"' for col in df.columns])
 
-        with connection.connection.cursor() as cursor:
-            copy_sql = f'COPY "{table_name}" ({column_names}) FROM STDIN WITH CSV'
-            cursor.copy_expert(copy_sql, buffer)
-            connection.connection.commit()
+    with connection.connection.cursor() as cursor:
+        copy_sql = f'COPY "{table_name}" ({column_names}) FROM STDIN WITH (FORMAT csv, FREEZE true)'
+        cursor.copy_expert(copy_sql, buffer)
 
-        return await save_meta_data(table_id, db)
+    return buffer
 
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Error in bulk insert: {str(e)}")
+# ─────────────────────────────────────────────────────────────────
+# INDEXES
+# ─────────────────────────────────────────────────────────────────
+
+def create_indexes(df, table_name: str, table_id: str, db: Session):
+    """
+    Builds the index used by graph queries (`WHERE region = ... GROUP BY
+    segment`) once, after the data is loaded, rather than maintaining it row
+    by row during COPY.
+
+    The index is named after the short `table_id`, not the table: Postgres
+    truncates identifiers to 63 bytes, which would cut the unique suffix off
+    "ix_<region>_<market>_<uuid8>_..." and make two uploads of one market clash.
+    """
+    index_columns = [col for col in ("region", "segment") if col in df.columns]
+    if not index_columns:
+        return
+
+    column_list = ", ".join([f'"{col}"' for col in index_columns])
+    db.execute(text(f'CREATE INDEX "ix_{table_id}_{"_".join(index_columns)}" ON "{table_name}" ({column_list})'))
 
 # ─────────────────────────────────────────────────────────────────
 # DATA EXTRACTION UTILITIES
@@ -95,9 +129,7 @@ def extract_unique_values(db: Session, table_name: str, column: str):
     """
     query = text(f"SELECT DISTINCT {column} FROM {table_name} WHERE {column} IS NOT NULL")
     
-    values = [str(row[0]).strip() for row in db.execute(query).fetchall()]
-    
-    return json.dumps(values, ensure_ascii=False)
+    return [str(row[0]).strip() for row in db.execute(query).fetchall()]
 
 def extract_columns_like(db: Session, table_name: str, keyword: str):
     """
@@ -171,38 +203,138 @@ def create_nested_segment(columns: list, table_name: str, db: Session):
 # SAVE META DATA
 # ─────────────────────────────────────────────────────────────────
 
-async def save_meta_data(table_id: str, db: Session):
+def save_meta_data(table_id: str, db: Session, data_db: Session = None):
     """
-    Updates and stores metadata for a given table.
+    Updates metadata for a given table. Nothing is committed.
 
     Args:
         table_id (str): Unique table ID.
-        db (Session): SQLAlchemy database session.
+        db (Session): SQLAlchemy session on the catalog database.
+        data_db (Session): Session on the shard holding the table, when it
+            is not the catalog database.
 
     Returns:
         JSON-encoded updated metadata.
     """
+    data_db = data_db or db
+
     table = db.query(MetaTable).filter(MetaTable.id == table_id).first()
     if not table:
         raise HTTPException(status_code=404, detail="Table not found")
 
     table_name = table.table_name
 
-    try:
-        # Extract necessary metadata
-        table.region = extract_unique_values(db, table_name, "region")
-        segment_columns = extract_columns_like(db, table_name, "segment")
-        table.segment_subsegment = create_nested_segment(segment_columns, table_name, db)
+    # Extract necessary metadata
+    table.region = extract_unique_values(data_db, table_name, "region")
+    segment_columns = extract_columns_like(data_db, table_name, "segment")
+    table.segment_subsegment = create_nested_segment(segment_columns, table_name, data_db)
 
-        date_columns = extract_columns_like(db, table_name, "year")
-        if date_columns:
-            table.start_year, table.end_year = map(split_date, [date_columns[0], date_columns[-1]])
+    date_columns = extract_columns_like(data_db, table_name, "year")
+    if date_columns:
+        table.start_year, table.end_year = map(split_date, [date_columns[0], date_columns[-1]])
 
-        db.commit()
-        db.refresh(table)
+    db.flush()
 
-        return jsonable_encoder(table)
+    return jsonable_encoder(table)
 
+# ─────────────────────────────────────────────────────────────────
+# DATASET LOAD
+# ─────────────────────────────────────────────────────────────────
+
+def _drop_table(db: Session, table_name: str):
+    try:
+        db.execute(text(f'DROP TABLE IF EXISTS "{table_name}"'))
+        db.commit()
     except Exception as e:
         db.rollback()
-        raise HTTPException(status_code=500, detail=f"Error saving metadata: {str(e)}")
+        logger.error("Could not drop unregistered table %s: %s", table_name, e)
+
+
+def store_dataset(df, table_name: str, table_id: str, db: Session, market_name: str = None, shard: str = None):
+    """
+    Loads a DataFrame as a new dataset in a single transaction.
+
+    Steps:
+    1. Pick the shard (see `choose_shard`) and CREATE TABLE there.
+    2. Register the dataset in MetaTable.
+    3. COPY ... FREEZE the rows.
+    4. Build the graph query index.
+    5. Fill in the metadata, then commit.
+    6. ANALYZE, so the first graph query is planned with statistics.
+    7. Optionally cache the rows in the columnar engine.
+
+    On the default shard the catalog and the table share one transaction, so
+    a failure at any step before the commit leaves neither an orphan table
+    nor a MetaTable row. On another shard the table is committed first and
+    dropped again if the catalog commit fails.
+
+    Returns:
+        JSON-encoded metadata of the new dataset.
+    """
+    timings = {}
+    started = time.perf_counter()
+
+    def mark(step: str):
+        nonlocal started
+        now = time.perf_counter()
+        timings[step] = round((now - started) * 1000, 1)
+        started = now
+
+    shard = choose_shard(db, table_id, shard)
+    # The default shard is the catalog database itself
+    data_db = db if shard == DEFAULT_SHARD else SessionLocal(bind=shard_engine(shard))
+    shard_committed = False
+
+    try:
+        try:
+            create_table(df, table_name, data_db)
+            register_table(table_id, table_name, db, market_name, shard)
+            mark("create_ms")
+
+            csv_buffer = bulk_insert_using_copy(df, table_name, data_db)
+            mark("copy_ms")
+
+            create_indexes(df, table_name, table_id, data_db)
+            mark("index_ms")
+
+            meta_data = save_meta_data(table_id, db, data_db)
+            if data_db is not db:
+                # Rows first: a table without a MetaTable row is never served
+                data_db.commit()
+                shard_committed = True
+            db.commit()
+            mark("metadata_commit_ms")
+
+        except Exception as e:
+            db.rollback()
+            if data_db is not db:
+                data_db.rollback()
+                if shard_committed:
+                    _drop_table(data_db, table_name)
+            if isinstance(e, HTTPException):
+                raise
+            raise HTTPException(status_code=500, detail=f"Error loading dataset: {str(e)}")
+
+        try:
+            data_db.execute(text(f'ANALYZE "{table_name}"'))
+            data_db.commit()
+            mark("analyze_ms")
+        except Exception as e:
+            # The dataset is already committed; autovacuum will analyze it later
+            data_db.rollback()
+            logger.warning("ANALYZE failed for %s: %s", table_name, e)
+
+    finally:
+        if data_db is not db:
+            data_db.close()
+
+    if COLUMNAR_ENGINE_ENABLED:
+        # The rows are still in memory; warm the columnar engine from them
+        try:
+            columnar_engine.add_csv(table_name, csv_buffer, df.columns)
+            mark("columnar_ms")
+        except Exception as e:
+            logger.warning("Columnar engine could not cache %s: %s", table_name, e)
+
+    logger.info("Loaded %s (%d rows) on shard %s: %s", table_name, len(df), shard, timings)
+    return meta_data
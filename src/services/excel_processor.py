@@ -1,3 +1,4 @@
+import asyncio
 import pandas as pd
 import re
 import uuid
@@ -5,7 +6,7 @@ import io
 import zipfile
 from fastapi import UploadFile, HTTPException
 from sqlalchemy.orm import Session
-from src.services.db_operations import create_table, bulk_insert_using_copy
+from src.services.db_operations import store_dataset
 
 # ─────────────────────────────────────────────────────────────────
 # UTILITY FUNCTIONS FOR SANITIZATION
@@ -42,6 +43,9 @@ def sanitize_table_name(name: str) -> str:
 def extract_table_name(file) -> str:
     """
     Extracts 'Region' and 'Market Name' from the 'Home' sheet to generate a unique table name.
+
+    Returns:
+        (table_name, unique_id, market_name) tuple.
     """
     df = pd.read_excel(file.file, sheet_name="Home", usecols=[0, 1])
     df.dropna(inplace=True)  # Drop empty rows
@@ -49,14 +53,14 @@ def extract_table_name(file) -> str:
     
     metadata_dict = {key.lower(): value for key, value in zip(df.iloc[:, 0], df.iloc[:, 1])}
     
+    market_name = str(metadata_dict.get("market name", "")).strip()
     region = sanitize_table_name(metadata_dict.get("region", ""))
-    market_name = sanitize_table_name(metadata_dict.get("market name", ""))
     
     unique_id = uuid.uuid4().hex[:8]  # Generate a short UUID for uniqueness
-    table_name = f"{region}_{market_name}_{unique_id}"
+    table_name = f"{region}_{sanitize_table_name(market_name)}_{unique_id}"
     
     print(f"Generated Table Name: {table_name}")
-    return table_name, unique_id
+    return table_name, unique_id, market_name
 
 # ─────────────────────────────────────────────────────────────────
 # EXCEL FILE PROCESSING FROM 'MASTER SHEET'
@@ -67,66 +71,66 @@ def process_excel_file(file) -> pd.DataFrame:
     Reads an Excel file and cleans its data.
     """
     df = pd.read_excel(file.file, sheet_name="Master Sheet", skiprows=5)
-    table_name, table_id = extract_table_name(file)
+    table_name, table_id, market_name = extract_table_name(file)
     
     df.dropna(axis=1, inplace=True)  # Drop fully empty columns
     if df.empty:
         return None
     
     df.columns = [sanitize_column_name(col) for col in df.columns]
-    return df, table_name, table_id
+    return df, table_name, table_id, market_name
 
 # ─────────────────────────────────────────────────────────────────
 # FILE UPLOAD HANDLING
 # ─────────────────────────────────────────────────────────────────
 
-async def process_and_store_excel(file: UploadFile, contents: bytes, db: Session):
+async def process_and_store_excel(file: UploadFile, db: Session, shard: str = None):
     """
-    Processes and stores an individual Excel file.
+    Processes and stores an individual Excel file, on `shard` if one is given.
+    The workbook is read from `file.file`.
     """
-    df, table_name, table_id = process_excel_file(UploadFile(filename=file.filename, file=io.BytesIO(contents)))
+    df, table_name, table_id, market_name = process_excel_file(file)
     
     if df is None:
         raise HTTPException(status_code=400, detail=f"The file {file.filename} contains no valid data")
     
-    create_table(df, table_name, db, table_id)
-    await bulk_insert_using_copy(df, table_name, db, table_id)
+    # In a worker thread, so the event loop can still cancel it if the client disconnects
+    await asyncio.to_thread(store_dataset, df, table_name, table_id, db, market_name, shard)
     
     return {"message": "Data uploaded successfully", "table_name": table_name}
 
 
-async def process_zip_file(contents: bytes, db: Session):
+async def process_zip_file(source, db: Session, shard: str = None):
     """
-    Extracts and processes Excel files from a ZIP archive.
+    Extracts and processes Excel files from a ZIP archive, given as a path or
+    a seekable binary file. Members are extracted one at a time, so only the
+    workbook being processed is held in memory.
     """
-    zip_buffer = io.BytesIO(contents)
     extracted_files = []
     excel_upload_responses = []
     failed_files = []
     
     try:
-        with zipfile.ZipFile(zip_buffer, "r") as zip_ref:
-            for file_name in zip_ref.namelist():
-                if file_name.lower().endswith((".xls", ".xlsx")):
-                    file_data = zip_ref.read(file_name)
-                    extracted_files.append(UploadFile(filename=file_name, file=io.BytesIO(file_data)))
-        
-        if not extracted_files:
-            raise HTTPException(status_code=400, detail="No valid Excel files found in ZIP")
+        with zipfile.ZipFile(source, "r") as zip_ref:
+            extracted_files = [name for name in zip_ref.namelist() if name.lower().endswith((".xls", ".xlsx"))]
         
-        # Process extracted Excel files
-        for extracted_file in extracted_files:
-            try:
-                response = await process_and_store_excel(extracted_file, extracted_file.file.read(), db)
-                excel_upload_responses.append({"file": extracted_file.filename, "response": response})
-            except Exception as e:
-                failed_files.append({"file": extracted_file.filename, "error": str(e)})
+            if not extracted_files:
+                raise HTTPException(status_code=400, detail="No valid Excel files found in ZIP")
+            
+            # Process extracted Excel files
+            for file_name in extracted_files:
+                try:
+                    extracted_file = UploadFile(filename=file_name, file=io.BytesIO(zip_ref.read(file_name)))
+                    response = await process_and_store_excel(extracted_file, db, shard)
+                    excel_upload_responses.append({"file": file_name, "response": response})
+                except Exception as e:
+                    failed_files.append({"file": file_name, "error": str(e)})
     
     except zipfile.BadZipFile:
         raise HTTPException(status_code=400, detail="Corrupt or invalid ZIP file")
     
     return {
-        "extracted_files": [f.filename for f in extracted_files],
+        "extracted_files": extracted_files,
         "excel_upload_results": excel_upload_responses,
         "failed_files": failed_files  # Return the list of failed files
     }
\ No newline at end of file
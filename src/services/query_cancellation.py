@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+from sqlalchemy.exc import DBAPIError
+
+logger = logging.getLogger(__name__)
+
+# SQLSTATE of a statement stopped by a cancel request or by statement_timeout
+_QUERY_CANCELED = "57014"
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+# Cancel requests get their own threads: the default executor also runs the
+# statements being cancelled (asyncio.to_thread), and is full exactly when
+# cancelling matters most
+_cancel_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="query-cancel")
+
+# ─────────────────────────────────────────────────────────────────
+# REQUEST SCOPE
+# ─────────────────────────────────────────────────────────────────
+
+class RequestCancelled(Exception):
+    """Raised instead of starting a statement for a cancelled or timed out request."""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Request cancelled ({reason})")
+        self.reason = reason
+
+
+class RequestScope:
+    """
+    Deadline and in-flight database connections of one HTTP request.
+
+    `cancel()` (on client disconnect or when the deadline passes) sends a
+    Postgres cancel request for every statement the request is running, and
+    later statements are refused with `RequestCancelled`.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.deadline = None  # time.monotonic() value
+        self.cancelled = None  # "deadline" | "disconnect"
+        self.completed = False
+        self._connections = set()  # DBAPI connections executing a statement or streaming its rows
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def set_timeout(self, seconds: float):
+        """Moves the deadline to `seconds` from now, unless it is already earlier."""
+        if not seconds or seconds <= 0:
+            return
+        deadline = time.monotonic() + seconds
+        if self.deadline is not None and self.deadline <= deadline:
+            return
+
+        self.deadline = deadline
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = self.loop.call_later(seconds, self.cancel, "deadline")
+
+    def remaining_ms(self):
+        if self.deadline is None:
+            return None
+        return (self.deadline - time.monotonic()) * 1000
+
+    def cancel(self, reason: str):
+        """Cancels the request's running statements. Must be called on the event loop."""
+        if self.cancelled or self.completed:
+            return
+        self.cancelled = reason
+        _count("client_disconnected" if reason == "disconnect" else "deadline_exceeded")
+
+        with self._lock:
+            has_connections = bool(self._connections)
+        if has_connections:
+            # psycopg2's cancel() opens a connection to the server; keep it off the loop
+            self.loop.run_in_executor(_cancel_executor, self._cancel_connections)
+
+    def _cancel_connections(self):
+        # Holding the lock keeps a connection from being released (and reused
+        # by another request) while its cancel request is being sent
+        with self._lock:
+            for dbapi_connection in self._connections:
+                try:
+                    dbapi_connection.cancel()
+                    _count("queries_cancelled")
+                except Exception as e:
+                    logger.warning("Could not cancel query: %s", e)
+
+    def close(self):
+        self.completed = True
+        if self._timer is not None:
+            self._timer.cancel()
+
+
+current_request: ContextVar[RequestScope] = ContextVar("current_request", default=None)
+
+# ─────────────────────────────────────────────────────────────────
+# STATISTICS
+# ─────────────────────────────────────────────────────────────────
+
+def _count(key: str):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def get_cancellation_stats() -> dict:
+    """
+    Counters for this worker process:
+    - deadline_exceeded / client_disconnected: requests cancelled, by reason.
+    - queries_cancelled: cancel requests sent for running statements.
+    - statement_timeouts: statements stopped by `statement_timeout`.
+    - statements_refused: statements not started for a cancelled request.
+    """
+    with _stats_lock:
+        return dict(_stats)
+
+
+def is_cancellation(error: Exception) -> bool:
+    """True for errors caused by a cancelled statement or request."""
+    if isinstance(error, RequestCancelled):
+        return True
+    return isinstance(error, DBAPIError) and getattr(error.orig, "pgcode", None) == _QUERY_CANCELED
+
+# ─────────────────────────────────────────────────────────────────
+# ENGINE EVENT HOOKS
+# ─────────────────────────────────────────────────────────────────
+
+def _set_statement_timeout(conn, scope: RequestScope, remaining_ms: float):
+    # Server-side backstop, also when the event loop is too busy to cancel.
+    # Issued once per transaction, with the time left at its first statement;
+    # SET LOCAL ends with the transaction, so pooled connections come back clean.
+    if conn.info.get("statement_timeout_scope") is scope:
+        return
+    conn.exec_driver_sql(
+        "SET LOCAL statement_timeout = %s", (max(1, int(remaining_ms)),),
+        execution_options={"stream_results": False},
+    )
+    conn.info["statement_timeout_scope"] = scope
+
+
+def _before_execute(conn, clauseelement, multiparams, params, execution_options):
+    # Runs before any cursor-level hook, so a refused statement leaves no trace
+    scope = current_request.get()
+    if scope is None:
+        return
+
+    remaining_ms = scope.remaining_ms()
+    if scope.cancelled or (remaining_ms is not None and remaining_ms <= 0):
+        _count("statements_refused")
+        raise RequestCancelled(scope.cancelled or "deadline")
+
+    # A streaming read's rows come from FETCHes SQLAlchemy never sees, so a
+    # timeout here would bound each FETCH, not the read; the deadline stops
+    # it through the cancel request instead (see _after_cursor_execute)
+    if remaining_ms is not None and not execution_options.get("stream_results"):
+        _set_statement_timeout(conn, scope, remaining_ms)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    scope = current_request.get()
+    if scope is None:
+        return
+
+    dbapi_connection = conn.connection.dbapi_connection
+    with scope._lock:
+        scope._connections.add(dbapi_connection)
+    conn.info["request_scope"] = scope
+
+
+def _discard(scope: RequestScope, dbapi_connection):
+    with scope._lock:
+        scope._connections.discard(dbapi_connection)
+
+
+def _release(conn):
+    scope = conn.info.pop("request_scope", None)
+    if scope is not None and conn.connection is not None:
+        _discard(scope, conn.connection.dbapi_connection)
+    return scope
+
+
+def _transaction_ended(conn):
+    conn.info.pop("statement_timeout_scope", None)
+    # Closes any server-side cursor still being read on the connection
+    _release(conn)
+
+
+def _pool_reset(dbapi_connection, connection_record, reset_state):
+    # A connection rolled back by the pool (not through a Connection) also ends its transaction
+    connection_record.info.pop("statement_timeout_scope", None)
+    scope = connection_record.info.pop("request_scope", None)
+    if scope is not None:
+        _discard(scope, dbapi_connection)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # With stream_results the statement only DECLAREd a server-side cursor;
+    # its rows are fetched while the result is read, so the connection stays
+    # cancellable until its transaction ends or it goes back to the pool
+    if not context.execution_options.get("stream_results"):
+        _release(conn)
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    scope = _release(conn) if conn is not None else None
+
+    pgcode = getattr(exception_context.original_exception, "pgcode", None)
+    if scope is not None and pgcode == _QUERY_CANCELED and not scope.cancelled:
+        _count("statement_timeouts")
+
+
+def install_query_cancellation():
+    """
+    Registers the cancellation hooks on every SQLAlchemy engine in the process.
+    Safe to call more than once.
+    """
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_execute", _before_execute)
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+        event.listen(Engine, "commit", _transaction_ended)
+        event.listen(Engine, "rollback", _transaction_ended)
+        event.listen(Pool, "reset", _pool_reset)
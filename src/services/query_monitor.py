@@ -0,0 +1,200 @@
+import logging
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from src.config.config import (
+    SLOW_QUERY_THRESHOLD_MS,
+    SLOW_QUERY_EXPLAIN_SAMPLE_RATE,
+    SLOW_QUERY_MAX_SHAPES,
+)
+
+logger = logging.getLogger("tmr.slow_query")
+
+# Route template of the request currently being served (set per request).
+current_route: ContextVar[str] = ContextVar("current_route", default="-")
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+# EXPLAIN ANALYZE re-runs the statement, so it happens off the request path.
+_explain_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+
+# ─────────────────────────────────────────────────────────────────
+# STATEMENT NORMALIZATION
+# ─────────────────────────────────────────────────────────────────
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PYFORMAT_PARAM = re.compile(r"%\(\w+\)s|%s")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+# Dataset tables are named "<region>_<market>_<8 hex digits>" (see excel_processor)
+_DATASET_TABLE = re.compile(r'"?\b\w+_[0-9a-f]{8}\b"?')
+_TABLE_NAME = re.compile(r'\b(?:FROM|INTO|UPDATE|TABLE)\s+"?(\w+)"?', re.IGNORECASE)
+
+
+def normalize_statement(statement: str) -> str:
+    """
+    Reduces a SQL statement to its shape by replacing literals and bound
+    parameters with `?`, dataset table names with `<dataset>`, and
+    collapsing IN lists and whitespace, so every upload of the same kind
+    of dataset shares one shape.
+
+    Example:
+        Input:  'SELECT a FROM "asia_x_1a2b3c4d" WHERE region=\'Asia\' AND x IN (1, 2)'
+        Output: "SELECT a FROM <dataset> WHERE region=? AND x IN (...)"
+    """
+    shape = _STRING_LITERAL.sub("?", statement)
+    shape = _DATASET_TABLE.sub("<dataset>", shape)
+    shape = _PYFORMAT_PARAM.sub("?", shape)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _IN_LIST.sub("IN (...)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+def statement_table(statement: str) -> str:
+    """Returns the first table referenced by the statement, if any."""
+    match = _TABLE_NAME.search(statement)
+    return match.group(1) if match else None
+
+# ─────────────────────────────────────────────────────────────────
+# STATISTICS
+# ─────────────────────────────────────────────────────────────────
+
+def _record(shape: str, table: str, route: str, duration_ms: float):
+    with _stats_lock:
+        entry = _stats.get(shape)
+        if entry is None:
+            if len(_stats) >= SLOW_QUERY_MAX_SHAPES:
+                # Evict the shape that has cost the least in total
+                cheapest = min(_stats, key=lambda key: _stats[key]["total_ms"])
+                del _stats[cheapest]
+            entry = _stats[shape] = {
+                "statement": shape,
+                "count": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "tables": set(),
+                "routes": set(),
+                "plan": None,
+            }
+
+        entry["count"] += 1
+        entry["total_ms"] += duration_ms
+        entry["max_ms"] = max(entry["max_ms"], duration_ms)
+        if table:
+            entry["tables"].add(table)
+        entry["routes"].add(route)
+
+
+def _store_plan(shape: str, plan):
+    with _stats_lock:
+        if shape in _stats:
+            _stats[shape]["plan"] = plan
+
+
+def get_slow_queries(limit: int = 20, order_by: str = "total_ms"):
+    """
+    Returns the slowest recorded statement shapes.
+
+    Args:
+        limit (int): Maximum number of shapes to return.
+        order_by (str): One of "total_ms", "max_ms", "count" or "avg_ms".
+    """
+    with _stats_lock:
+        entries = [
+            {
+                "statement": entry["statement"],
+                "count": entry["count"],
+                "total_ms": round(entry["total_ms"], 3),
+                "avg_ms": round(entry["total_ms"] / entry["count"], 3),
+                "max_ms": round(entry["max_ms"], 3),
+                "tables": sorted(entry["tables"])[:20],
+                "routes": sorted(entry["routes"]),
+                "plan": entry["plan"],
+            }
+            for entry in _stats.values()
+        ]
+
+    entries.sort(key=lambda entry: entry[order_by], reverse=True)
+    return entries[:limit]
+
+
+def reset_slow_queries():
+    with _stats_lock:
+        _stats.clear()
+
+# ─────────────────────────────────────────────────────────────────
+# SAMPLED EXPLAIN ANALYZE
+# ─────────────────────────────────────────────────────────────────
+
+def _explain(engine: Engine, shape: str, statement: str, parameters):
+    """Re-runs a slow SELECT under EXPLAIN (ANALYZE, BUFFERS) on a pooled connection."""
+    try:
+        raw_connection = engine.raw_connection()
+        try:
+            with raw_connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}", parameters)
+                plan = cursor.fetchone()[0]
+            raw_connection.rollback()
+        finally:
+            raw_connection.close()
+
+        _store_plan(shape, plan)
+
+    except Exception as e:
+        logger.warning("EXPLAIN ANALYZE failed for slow query: %s", e)
+
+# ─────────────────────────────────────────────────────────────────
+# ENGINE EVENT HOOKS
+# ─────────────────────────────────────────────────────────────────
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get("query_start_time")
+    if not start_times:
+        return
+
+    duration_ms = (time.perf_counter() - start_times.pop()) * 1000
+    if duration_ms < SLOW_QUERY_THRESHOLD_MS:
+        return
+
+    shape = normalize_statement(statement)
+    table = statement_table(statement)
+    route = current_route.get()
+
+    _record(shape, table, route, duration_ms)
+    logger.warning(
+        "Slow query (%.1f ms) route=%s table=%s: %s", duration_ms, route, table, shape
+    )
+
+    # Only plain reads are safe to re-run: EXPLAIN ANALYZE executes the statement
+    is_read = statement.lstrip().upper().startswith("SELECT")
+    if is_read and not executemany and random.random() < SLOW_QUERY_EXPLAIN_SAMPLE_RATE:
+        _explain_executor.submit(_explain, conn.engine, shape, statement, parameters)
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute; drop its timer
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start_time"):
+        conn.info["query_start_time"].pop()
+
+
+def install_query_monitor():
+    """
+    Registers the slow query hooks on every SQLAlchemy engine in the process.
+    Safe to call more than once.
+    """
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
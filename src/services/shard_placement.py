@@ -0,0 +1,75 @@
+import logging
+import zlib
+from fastapi import HTTPException
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+from src.config.config import SHARD_PLACEMENT
+from src.database.connect_db import DEFAULT_SHARD, shard_engines
+from src.models.meta_table_model import MetaTable
+
+logger = logging.getLogger(__name__)
+
+PLACEMENT_POLICIES = ("manual", "hash", "least_loaded")
+
+# ─────────────────────────────────────────────────────────────────
+# SHARD USAGE
+# ─────────────────────────────────────────────────────────────────
+
+def _database_size(shard: str):
+    try:
+        with shard_engines[shard].connect() as connection:
+            return connection.execute(text("SELECT pg_database_size(current_database())")).scalar()
+    except Exception as e:
+        logger.warning("Shard %s is unavailable: %s", shard, e)
+        return None
+
+
+def shard_usage(db: Session) -> dict:
+    """
+    Returns, per configured shard, the number of datasets the catalog places
+    on it and the size of its database in bytes (None when unreachable).
+    """
+    counts = dict(
+        db.query(func.coalesce(MetaTable.shard, DEFAULT_SHARD), func.count())
+        .group_by(func.coalesce(MetaTable.shard, DEFAULT_SHARD))
+        .all()
+    )
+    return {
+        shard: {"datasets": counts.get(shard, 0), "size_bytes": _database_size(shard)}
+        for shard in shard_engines
+    }
+
+# ─────────────────────────────────────────────────────────────────
+# PLACEMENT
+# ─────────────────────────────────────────────────────────────────
+
+def choose_shard(db: Session, table_id: str, requested: str = None) -> str:
+    """
+    Picks the shard a new dataset is stored on.
+
+    An explicitly requested shard always wins. Otherwise `SHARD_PLACEMENT`
+    decides:
+    - manual: the default shard.
+    - hash: a stable hash of the dataset id over all shards.
+    - least_loaded: the reachable shard with the smallest database.
+    """
+    if requested:
+        if requested not in shard_engines:
+            raise HTTPException(status_code=400, detail=f"Unknown shard '{requested}'.")
+        return requested
+
+    shards = sorted(shard_engines)
+    if len(shards) == 1 or SHARD_PLACEMENT == "manual":
+        return DEFAULT_SHARD
+
+    if SHARD_PLACEMENT == "hash":
+        return shards[zlib.crc32(table_id.encode("utf-8")) % len(shards)]
+
+    if SHARD_PLACEMENT == "least_loaded":
+        sizes = {shard: _database_size(shard) for shard in shards}
+        reachable = {shard: size for shard, size in sizes.items() if size is not None}
+        if not reachable:
+            raise HTTPException(status_code=503, detail="No dataset shard is reachable.")
+        return min(reachable, key=reachable.get)
+
+    raise ValueError(f"SHARD_PLACEMENT must be one of: {', '.join(PLACEMENT_POLICIES)}")
@@ -0,0 +1,114 @@
+import asyncio
+import json
+from collections import Counter, defaultdict
+from src.config.config import SINGLE_FLIGHT_ENABLED
+from src.services.query_cancellation import RequestCancelled, current_request, is_cancellation
+
+# ─────────────────────────────────────────────────────────────────
+# SINGLE FLIGHT
+# ─────────────────────────────────────────────────────────────────
+
+def _own_request_cancelled() -> bool:
+    request = current_request.get()
+    if request is None:
+        return False
+    remaining_ms = request.remaining_ms()
+    return bool(request.cancelled) or (remaining_ms is not None and remaining_ms <= 0)
+
+
+def _own_remaining_seconds():
+    """Seconds until the current request's deadline, or None without one."""
+    request = current_request.get()
+    remaining_ms = request.remaining_ms() if request is not None else None
+    return None if remaining_ms is None else max(remaining_ms / 1000, 0)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls within a worker process: while a
+    call for a key is in flight, later callers with the same key wait for it
+    and receive its result, or its exception, instead of running it again.
+
+    The shared call runs in the first caller's request context, so it must
+    not use that request's resources (such as its Session): the call can
+    outlive the first caller. If that request is cancelled (disconnect or
+    deadline), the other callers do not inherit the cancellation; one of
+    them runs the call again. A waiting caller still gives up at its own
+    request deadline, with `RequestCancelled`.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._flights = {}
+        self._stats = defaultdict(Counter)  # name -> executed / coalesced / deadline_exceeded
+
+    @staticmethod
+    def key(name: str, payload) -> str:
+        """Normalized key: same name and payload (in any key order) => same key."""
+        return json.dumps([name, payload], sort_keys=True, default=str, separators=(",", ":"))
+
+    def _start(self, name: str, key: str, call):
+        flight = asyncio.ensure_future(call())
+        self._flights[key] = flight
+        self._stats[name]["executed"] += 1
+
+        def finished(done):
+            if self._flights.get(key) is done:
+                del self._flights[key]
+            if not done.cancelled():
+                done.exception()  # Retrieved here in case every caller went away
+
+        flight.add_done_callback(finished)
+        return flight
+
+    async def run(self, name: str, payload, call):
+        """
+        Returns the result of `await call()`, shared with every concurrent
+        caller passing the same `name` and `payload`.
+        """
+        if not self.enabled:
+            return await call()
+
+        key = self.key(name, payload)
+        while True:
+            flight = self._flights.get(key)
+            if flight is None:
+                # shield: the shared call outlives a cancelled first caller
+                return await asyncio.shield(self._start(name, key, call))
+
+            # asyncio.wait neither cancels the flight on timeout nor when
+            # this caller is cancelled
+            done, _ = await asyncio.wait({flight}, timeout=_own_remaining_seconds())
+            if not done:
+                self._stats[name]["deadline_exceeded"] += 1
+                raise RequestCancelled("deadline")
+
+            try:
+                result = flight.result()
+            except Exception as e:
+                if is_cancellation(e) and not _own_request_cancelled():
+                    continue
+                self._stats[name]["coalesced"] += 1
+                raise
+            self._stats[name]["coalesced"] += 1
+            return result
+
+    def snapshot(self) -> dict:
+        """
+        Per call name: executions, executions saved by coalescing, and
+        waiting callers that gave up at their own deadline.
+        """
+        return {
+            "in_flight": len(self._flights),
+            "calls": {
+                name: {
+                    "executed": stats["executed"],
+                    "coalesced": stats["coalesced"],
+                    "deadline_exceeded": stats["deadline_exceeded"],
+                }
+                for name, stats in self._stats.items()
+            },
+        }
+
+
+single_flight = SingleFlight(enabled=SINGLE_FLIGHT_ENABLED)
@@ -0,0 +1,346 @@
+import asyncio
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from fastapi import HTTPException
+from src.config.config import (
+    UPLOAD_SESSION_DIR,
+    UPLOAD_SESSION_TTL,
+    UPLOAD_SESSION_GC_INTERVAL,
+    UPLOAD_SESSION_MAX_BYTES,
+    UPLOAD_CHUNK_MAX_BYTES,
+)
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_EXTENSIONS = ("xls", "xlsx", "zip")
+
+_UPLOAD_ID = re.compile(r"^[0-9a-f]{32}$")
+_SHA256 = re.compile(r"^[0-9a-fA-F]{64}$")
+_DATA_FILE = "data.part"
+_META_FILE = "meta.json"
+_LOCK_FILE = "lock"
+# Received pieces are written (and hashed) in worker threads this many bytes at a time
+_WRITE_BATCH_BYTES = 1024 * 1024
+
+# ─────────────────────────────────────────────────────────────────
+# UPLOAD SESSION STORE
+# ─────────────────────────────────────────────────────────────────
+
+class UploadSessionStore:
+    """
+    Resumable uploads staged on local disk, one directory per session:
+
+    - `data.part`: the bytes received so far; its committed length is the
+      session's offset.
+    - `meta.json`: owner, expected size/checksum and the committed chunks.
+    - `lock`: flock()ed while a chunk is written or the upload finalized,
+      so concurrent requests (from any worker process) cannot interleave.
+
+    Sessions not touched for `ttl` seconds are deleted by `collect_garbage`,
+    which `run_garbage_collector` calls every `gc_interval` seconds.
+
+    File writes, fsync and hashing run in worker threads so that large chunks
+    never stall the event loop.
+    """
+
+    def __init__(self, root: str, ttl: int, gc_interval: int, max_bytes: int, chunk_max_bytes: int):
+        self.root = root
+        self.ttl = ttl
+        self.gc_interval = gc_interval
+        self.max_bytes = max_bytes
+        self.chunk_max_bytes = chunk_max_bytes
+        self._last_gc = 0.0
+
+    def _path(self, upload_id: str, name: str = "") -> str:
+        if not _UPLOAD_ID.match(upload_id):
+            raise HTTPException(status_code=404, detail="Upload session not found")
+        return os.path.join(self.root, upload_id, name)
+
+    def _read_meta(self, upload_id: str) -> dict:
+        try:
+            with open(self._path(upload_id, _META_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Upload session not found")
+
+    def _write_meta(self, upload_id: str, meta: dict):
+        # Replace atomically so a crash never leaves half-written metadata
+        tmp_path = self._path(upload_id, _META_FILE + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._path(upload_id, _META_FILE))
+
+    def _owned_meta(self, upload_id: str, user_id: str) -> dict:
+        meta = self._read_meta(upload_id)
+        if meta["user_id"] != user_id:
+            raise HTTPException(status_code=404, detail="Upload session not found")
+        return meta
+
+    @contextmanager
+    def _locked(self, upload_id: str):
+        try:
+            lock_file = open(self._path(upload_id, _LOCK_FILE), "a")
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Upload session not found")
+
+        with lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise HTTPException(status_code=409, detail="Another request is writing to this upload")
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _status(self, meta: dict) -> dict:
+        return {
+            "upload_id": meta["upload_id"],
+            "filename": meta["filename"],
+            "size": meta["size"],
+            "offset": meta["offset"],
+            "next_chunk": len(meta["chunks"]),
+            "complete": meta["offset"] == meta["size"],
+            "chunk_max_bytes": self.chunk_max_bytes,
+            "expires_at": meta["updated_at"] + self.ttl,
+        }
+
+    # ----------------------------------------
+    # Protocol
+    # ----------------------------------------
+
+    def create(self, user_id: str, filename: str, size: int, sha256: str = None, shard: str = None) -> dict:
+        """Opens a new upload session for a file of `size` bytes."""
+        if filename.lower().split(".")[-1] not in ALLOWED_EXTENSIONS:
+            raise HTTPException(status_code=400, detail="Only ZIP or Excel files are allowed")
+        if size <= 0:
+            raise HTTPException(status_code=400, detail="size must be positive")
+        if size > self.max_bytes:
+            raise HTTPException(status_code=413, detail=f"Uploads are limited to {self.max_bytes} bytes")
+        if sha256 is not None and not _SHA256.match(sha256):
+            raise HTTPException(status_code=400, detail="sha256 must be a hex SHA-256 digest")
+
+        upload_id = uuid.uuid4().hex
+        os.makedirs(self._path(upload_id))
+        open(self._path(upload_id, _DATA_FILE), "wb").close()
+
+        now = time.time()
+        meta = {
+            "upload_id": upload_id,
+            "user_id": user_id,
+            "filename": os.path.basename(filename),
+            "size": size,
+            "sha256": sha256.lower() if sha256 else None,
+            "shard": shard,
+            "offset": 0,
+            "chunks": [],  # [offset, length, sha256] per committed chunk
+            "created_at": now,
+            "updated_at": now,
+        }
+        self._write_meta(upload_id, meta)
+        return self._status(meta)
+
+    def status(self, upload_id: str, user_id: str) -> dict:
+        return self._status(self._owned_meta(upload_id, user_id))
+
+    async def write_chunk(self, upload_id: str, user_id: str, chunk_number: int, offset: int, sha256: str, stream) -> dict:
+        """
+        Appends chunk `chunk_number`, which must start at the committed offset
+        and hash to `sha256`, from the async byte `stream`.
+
+        Re-sending an already committed chunk (same number, offset and
+        checksum) is a no-op, so a client that lost the response can simply
+        retry. Anything else out of order is rejected with 409 and the
+        committed offset, from where the client resumes.
+        """
+        if not _SHA256.match(sha256 or ""):
+            raise HTTPException(status_code=400, detail="X-Chunk-SHA256 must be a hex SHA-256 digest")
+        sha256 = sha256.lower()
+
+        with self._locked(upload_id):
+            meta = self._owned_meta(upload_id, user_id)
+            chunks = meta["chunks"]
+
+            if chunk_number < len(chunks):
+                committed_offset, _, committed_sha256 = chunks[chunk_number]
+                if (committed_offset, committed_sha256) != (offset, sha256):
+                    raise HTTPException(status_code=409, detail=f"Chunk {chunk_number} was committed with different content")
+                return self._status(meta)
+
+            committed = meta["offset"]
+            if chunk_number != len(chunks) or offset != committed:
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"Expected chunk {len(chunks)} at offset {committed}",
+                    headers={"X-Upload-Offset": str(committed)},
+                )
+
+            digest = hashlib.sha256()
+            written = 0
+            with open(self._path(upload_id, _DATA_FILE), "r+b") as f:
+                # Drop whatever an interrupted attempt left past the committed offset
+                f.seek(committed)
+                f.truncate()
+                try:
+                    pending = bytearray()
+                    async for piece in stream:
+                        written += len(piece)
+                        if written > self.chunk_max_bytes:
+                            raise HTTPException(status_code=413, detail=f"Chunks are limited to {self.chunk_max_bytes} bytes")
+                        if committed + written > meta["size"]:
+                            raise HTTPException(status_code=400, detail="Chunk extends past the declared size")
+                        pending += piece
+                        if len(pending) >= _WRITE_BATCH_BYTES:
+                            await asyncio.to_thread(_append, f, digest, bytes(pending))
+                            pending.clear()
+                    if pending:
+                        await asyncio.to_thread(_append, f, digest, bytes(pending))
+
+                    if not written:
+                        raise HTTPException(status_code=400, detail="Empty chunk")
+                    if digest.hexdigest() != sha256:
+                        raise HTTPException(status_code=400, detail="Chunk checksum mismatch")
+
+                    await asyncio.to_thread(_sync, f)
+                except BaseException:
+                    f.seek(committed)
+                    f.truncate()
+                    raise
+
+            chunks.append([offset, written, sha256])
+            meta["offset"] = committed + written
+            meta["updated_at"] = time.time()
+            await asyncio.to_thread(self._write_meta, upload_id, meta)
+            return self._status(meta)
+
+    @asynccontextmanager
+    async def completed_file(self, upload_id: str, user_id: str):
+        """
+        Yields (meta, path) of a fully received upload while holding its lock,
+        after checking the whole-file checksum when one was declared.
+        """
+        with self._locked(upload_id):
+            meta = self._owned_meta(upload_id, user_id)
+            if meta["offset"] != meta["size"]:
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"Upload incomplete: {meta['offset']} of {meta['size']} bytes received",
+                    headers={"X-Upload-Offset": str(meta["offset"])},
+                )
+
+            path = self._path(upload_id, _DATA_FILE)
+            if meta["sha256"] and await asyncio.to_thread(_file_sha256, path) != meta["sha256"]:
+                raise HTTPException(status_code=400, detail="File checksum mismatch")
+
+            yield meta, path
+
+    def delete(self, upload_id: str, user_id: str = None):
+        if user_id is not None:
+            self._owned_meta(upload_id, user_id)
+        shutil.rmtree(self._path(upload_id), ignore_errors=True)
+
+    # ----------------------------------------
+    # Garbage Collection
+    # ----------------------------------------
+
+    def collect_garbage(self, force: bool = False) -> int:
+        """
+        Deletes sessions with no activity for `ttl` seconds, skipping any
+        that a request holds locked. Runs at most once per `gc_interval`
+        unless forced. Returns the number removed.
+        Blocking; call it from a worker thread while serving requests.
+        """
+        now = time.time()
+        if not force and now - self._last_gc < self.gc_interval:
+            return 0
+        self._last_gc = now
+
+        try:
+            entries = os.listdir(self.root)
+        except FileNotFoundError:
+            return 0
+
+        removed = 0
+        for upload_id in entries:
+            if not _UPLOAD_ID.match(upload_id):
+                continue
+            try:
+                updated_at = self._read_meta(upload_id)["updated_at"]
+            except (HTTPException, ValueError, KeyError):
+                # Metadata missing or unreadable (e.g. crashed during create)
+                try:
+                    updated_at = os.path.getmtime(self._path(upload_id))
+                except OSError:
+                    continue
+            if now - updated_at > self.ttl and self._remove_idle(upload_id):
+                removed += 1
+
+        if removed:
+            logger.info("Removed %d abandoned upload session(s)", removed)
+        return removed
+
+    def _remove_idle(self, upload_id: str) -> bool:
+        # Skip a session whose lock is held: a late chunk or a finalize is still using it
+        try:
+            lock_file = open(self._path(upload_id, _LOCK_FILE), "a")
+        except FileNotFoundError:
+            # Crashed during create, before the lock file existed
+            shutil.rmtree(self._path(upload_id), ignore_errors=True)
+            return True
+
+        with lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            try:
+                shutil.rmtree(self._path(upload_id), ignore_errors=True)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return True
+
+    async def run_garbage_collector(self):
+        """Sweeps expired sessions every `gc_interval` seconds until cancelled."""
+        while True:
+            await asyncio.sleep(self.gc_interval)
+            try:
+                await asyncio.to_thread(self.collect_garbage, True)
+            except Exception as e:
+                logger.warning("Upload session garbage collection failed: %s", e)
+
+
+def _append(f, digest, data: bytes):
+    digest.update(data)
+    f.write(data)
+
+
+def _sync(f):
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+upload_sessions = UploadSessionStore(
+    root=UPLOAD_SESSION_DIR,
+    ttl=UPLOAD_SESSION_TTL,
+    gc_interval=UPLOAD_SESSION_GC_INTERVAL,
+    max_bytes=UPLOAD_SESSION_MAX_BYTES,
+    chunk_max_bytes=UPLOAD_CHUNK_MAX_BYTES,
+)
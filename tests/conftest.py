@@ -0,0 +1,4 @@
+import os
+
+# Importing the app modules creates (but never connects) the SQLAlchemy engine
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/tmr_test")
@@ -0,0 +1,132 @@
+import random
+from decimal import Decimal, ROUND_HALF_UP
+
+import pandas as pd
+import pytest
+
+from src.services.columnar_engine import ColumnarDataset, DatasetTooLarge
+
+YEARS = ["year_2020", "year_2021", "year_2022"]
+
+
+def _frame(rows):
+    return pd.DataFrame(rows, columns=["region", "segment", *YEARS], dtype=object)
+
+
+def _reference(rows, region, years, segments=None):
+    """SELECT segment, ROUND(SUM(year::NUMERIC), 3) ... WHERE region = :region GROUP BY segment"""
+    groups = {}
+    for row in rows:
+        if row[0] != region or (segments and row[1] not in segments):
+            continue
+        sums = groups.setdefault(row[1], [None] * len(years))
+        for j, year in enumerate(years):
+            value = row[2 + YEARS.index(year)]
+            if value is not None:
+                sums[j] = (sums[j] or Decimal(0)) + Decimal(value)
+
+    return {
+        group: tuple(
+            None if total is None else total.quantize(Decimal("0.001"), rounding=ROUND_HALF_UP)
+            for total in sums
+        )
+        for group, sums in groups.items()
+    }
+
+
+def _assert_parity(rows, region, years=YEARS, segments=None):
+    actual = ColumnarDataset(_frame(rows)).group_sums(region, "segment", years, segments)
+    expected = _reference(rows, region, years, segments)
+
+    # str() keeps the scale, so Decimal("1.2") and Decimal("1.200") differ
+    as_text = lambda values: tuple(None if value is None else str(value) for value in values)
+    assert {row[0]: as_text(row[1:]) for row in actual} == {group: as_text(sums) for group, sums in expected.items()}
+    assert len(actual) == len(expected)
+
+
+def test_nulls():
+    rows = [
+        ["Asia", "A", "1.5", None, None],
+        ["Asia", "A", None, None, "2"],
+        ["Asia", None, "3.25", "1", None],  # NULL group
+        ["Asia", "B", None, None, None],  # group with no values at all
+        [None, "A", "100", "100", "100"],  # NULL region never matches
+        ["Europe", "A", "7", "7", "7"],
+    ]
+    _assert_parity(rows, "Asia")
+
+
+def test_negative_halves_round_away_from_zero():
+    rows = [
+        ["Asia", "A", "-0.0005", "0.0005", "-1.2345"],
+        ["Asia", "B", "-2.0015", "2.0015", "-0.0004"],
+        ["Asia", "B", "0", "0", "-0.0001"],
+        ["Asia", "C", "-0.00049999999", "-0.0015", "0.0025"],
+    ]
+    _assert_parity(rows, "Asia")
+
+
+def test_mixed_scales():
+    rows = [
+        ["Asia", "A", "1", "1.1", "1.123456789012"],
+        ["Asia", "A", "2.25", "-0.000000000001", "100"],
+        ["Asia", "A", "1e2", "3.14159", "0.0000005"],
+        ["Asia", "B", "12345678.9", "0.1", "-0.9999995"],
+    ]
+    _assert_parity(rows, "Asia")
+    _assert_parity(rows, "Asia", years=["year_2022", "year_2020"], segments=["B"])
+
+
+def test_unknown_region_and_year():
+    dataset = ColumnarDataset(_frame([["Asia", "A", "1", "2", "3"]]))
+    assert dataset.group_sums("Mars", "segment", YEARS) == []
+    assert dataset.group_sums("Asia", "segment", ["year_1999"]) is None
+
+
+def test_non_numeric_values_are_rejected():
+    with pytest.raises(DatasetTooLarge):
+        ColumnarDataset(_frame([["Asia", "A", "n/a", "2", "3"]]))
+
+
+def test_random_parity():
+    rng = random.Random(42)
+
+    def value():
+        if rng.random() < 0.2:
+            return None
+        digits = rng.choice([0, 1, 3, 4, 7, 10])
+        return str(round(rng.uniform(-1000, 1000), digits)) if digits else str(rng.randint(-1000, 1000))
+
+    rows = [
+        [rng.choice(["Asia", "Europe", None]), rng.choice(["A", "B", "C", None]), value(), value(), value()]
+        for _ in range(2000)
+    ]
+    for region in ("Asia", "Europe"):
+        _assert_parity(rows, region)
+        _assert_parity(rows, region, segments=["A", "C"])
+
+
+def test_nbytes_counts_dictionaries():
+    rows = [["Asia", f"segment {i} " + "x" * 200, "1", "2", "3"] for i in range(100)]
+    dataset = ColumnarDataset(_frame(rows))
+    assert dataset.nbytes > 100 * 200
+
+
+def test_batches_match_one_frame():
+    rng = random.Random(7)
+    # Early batches hold integers only; later ones add up to 10 decimals
+    rows = [
+        [rng.choice(["Asia", "Europe"]), rng.choice(["A", "B", None]),
+         str(rng.randint(-50, 50)), str(round(rng.uniform(-50, 50), 10 if i > 600 else 0)), None]
+        for i in range(1000)
+    ]
+    streamed = ColumnarDataset.streamed(["region", "segment", *YEARS])
+    for start in range(0, len(rows), 300):
+        streamed.append(_frame(rows[start:start + 300]))
+    streamed.finish()
+
+    whole = ColumnarDataset(_frame(rows))
+    assert streamed.scale == whole.scale == 10
+    for region in ("Asia", "Europe"):
+        assert streamed.group_sums(region, "segment", YEARS) == whole.group_sums(region, "segment", YEARS)
+        _assert_parity(rows, region)
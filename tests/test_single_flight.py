@@ -0,0 +1,146 @@
+import asyncio
+
+import pytest
+
+from src.services.query_cancellation import RequestCancelled, RequestScope, current_request
+from src.services.single_flight import SingleFlight
+
+
+def _in_request(coroutine, timeout: float = None, request: RequestScope = None):
+    """Runs `coroutine` as its own task with its own request scope, like a separate HTTP request."""
+    request = request or RequestScope(asyncio.get_running_loop())
+    request.set_timeout(timeout)
+
+    async def run():
+        current_request.set(request)
+        try:
+            return await coroutine
+        finally:
+            request.close()
+
+    return asyncio.ensure_future(run())
+
+
+def test_followers_share_the_result():
+    flight = SingleFlight()
+    calls = 0
+
+    async def call():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"value": 1}
+
+    async def run():
+        return await asyncio.gather(*[_in_request(flight.run("f", {"id": 1}, call)) for _ in range(5)])
+
+    results = asyncio.run(run())
+    assert calls == 1
+    assert all(result is results[0] for result in results)
+    assert flight.snapshot()["calls"]["f"] == {"executed": 1, "coalesced": 4, "deadline_exceeded": 0}
+    assert flight.snapshot()["in_flight"] == 0
+
+
+def test_followers_share_the_exception():
+    flight = SingleFlight()
+    calls = 0
+
+    async def call():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        raise ValueError("boom")
+
+    async def run():
+        tasks = [_in_request(flight.run("f", {"id": 1}, call)) for _ in range(3)]
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert calls == 1
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_different_payloads_do_not_coalesce():
+    flight = SingleFlight()
+
+    async def call():
+        await asyncio.sleep(0.01)
+        return object()
+
+    async def run():
+        return await asyncio.gather(
+            _in_request(flight.run("f", {"id": 1}, call)),
+            _in_request(flight.run("f", {"id": 2}, call)),
+        )
+
+    first, second = asyncio.run(run())
+    assert first is not second
+
+
+def test_follower_retries_when_the_leader_is_cancelled():
+    flight = SingleFlight()
+    calls = 0
+
+    async def call():
+        nonlocal calls
+        calls += 1
+        attempt = calls
+        await asyncio.sleep(0.05)
+        request = current_request.get()
+        if request.cancelled:
+            # What the cancellation hooks raise for the leader's statements
+            raise RequestCancelled(request.cancelled)
+        return attempt
+
+    async def run():
+        leader_request = RequestScope(asyncio.get_running_loop())
+        leader = _in_request(flight.run("f", {"id": 1}, call), request=leader_request)
+        await asyncio.sleep(0)
+        follower = _in_request(flight.run("f", {"id": 1}, call))
+        await asyncio.sleep(0.01)
+        # The leader's client disconnects while the shared call runs
+        leader_request.cancel("disconnect")
+        return await asyncio.gather(leader, follower, return_exceptions=True)
+
+    leader_result, follower_result = asyncio.run(run())
+    assert isinstance(leader_result, RequestCancelled)
+    assert follower_result == 2
+    assert calls == 2
+
+
+def test_follower_gives_up_at_its_own_deadline():
+    flight = SingleFlight()
+
+    async def call():
+        await asyncio.sleep(0.3)
+        return "done"
+
+    async def run():
+        leader = _in_request(flight.run("f", {"id": 1}, call))
+        await asyncio.sleep(0)
+        follower = _in_request(flight.run("f", {"id": 1}, call), timeout=0.05)
+        follower_result = await asyncio.gather(follower, return_exceptions=True)
+        # The shared call is not cancelled by the follower giving up
+        return follower_result[0], await leader
+
+    follower_result, leader_result = asyncio.run(run())
+    assert isinstance(follower_result, RequestCancelled)
+    assert follower_result.reason == "deadline"
+    assert leader_result == "done"
+    assert flight.snapshot()["calls"]["f"]["deadline_exceeded"] == 1
+
+
+def test_disabled_runs_every_call():
+    flight = SingleFlight(enabled=False)
+    calls = 0
+
+    async def call():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.gather(*[flight.run("f", {}, call) for _ in range(3)])
+
+    asyncio.run(run())
+    assert calls == 3
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from src.middleware.upload_admission_middleware import UploadAdmissionController
+
+
+def _controller(**overrides):
+    limits = dict(
+        max_concurrent=1, max_bytes=1024, queue_size=1, queue_timeout=1,
+        rate_per_minute=0, burst=1,
+    )
+    limits.update(overrides)
+    return UploadAdmissionController(**limits)
+
+
+def _assert_rejected(error: HTTPException, detail: str):
+    assert error.status_code == 429
+    assert error.detail == detail
+    assert int(error.headers["Retry-After"]) >= 1
+
+
+def test_queue_full_is_rejected():
+    controller = _controller(queue_size=0)
+
+    async def run():
+        async with controller.admit("a"):
+            with pytest.raises(HTTPException) as rejected:
+                async with controller.admit("b"):
+                    pass
+            return rejected.value
+
+    _assert_rejected(asyncio.run(run()), "Too many uploads in progress")
+    assert controller.decisions["rejected_queue_full"] == 1
+    assert controller.active == 0
+
+
+def test_queue_timeout_is_rejected():
+    controller = _controller(queue_size=1, queue_timeout=0.05)
+
+    async def run():
+        async with controller.admit("a"):
+            with pytest.raises(HTTPException) as rejected:
+                async with controller.admit("b"):
+                    pass
+            return rejected.value
+
+    _assert_rejected(asyncio.run(run()), "Timed out waiting for an upload slot")
+    assert controller.decisions["rejected_queue_timeout"] == 1
+    assert controller.waiting == 0
+
+
+def test_queued_upload_is_admitted_when_a_slot_frees():
+    controller = _controller(queue_size=1, queue_timeout=1)
+    order = []
+
+    async def upload(user, hold):
+        async with controller.admit(user):
+            order.append(user)
+            await asyncio.sleep(hold)
+
+    async def run():
+        await asyncio.gather(upload("a", 0.05), upload("b", 0))
+
+    asyncio.run(run())
+    assert order == ["a", "b"]
+    assert controller.decisions["queued"] == 1
+    assert controller.decisions["admitted"] == 2
+
+
+def test_empty_token_bucket_is_rejected():
+    controller = _controller(rate_per_minute=1, burst=1)
+
+    async def run():
+        async with controller.admit("a"):
+            pass
+        with pytest.raises(HTTPException) as rejected:
+            async with controller.admit("a"):
+                pass
+        # Buckets are per user
+        async with controller.admit("b"):
+            pass
+        return rejected.value
+
+    error = asyncio.run(run())
+    _assert_rejected(error, "Upload rate limit exceeded")
+    assert 55 <= int(error.headers["Retry-After"]) <= 60
+    assert controller.decisions["rejected_rate_limited"] == 1
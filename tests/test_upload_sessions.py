@@ -0,0 +1,107 @@
+import asyncio
+import fcntl
+import hashlib
+import os
+
+import pytest
+from fastapi import HTTPException
+
+from src.services.upload_sessions import UploadSessionStore
+
+
+def _store(tmp_path, **overrides):
+    limits = dict(ttl=60, gc_interval=60, max_bytes=1024, chunk_max_bytes=256)
+    limits.update(overrides)
+    return UploadSessionStore(root=str(tmp_path), **limits)
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+async def _stream(*pieces):
+    for piece in pieces:
+        yield piece
+
+
+def _write(store, upload_id, chunk_number, offset, data, sha256=None):
+    return asyncio.run(store.write_chunk(
+        upload_id, "user", chunk_number, offset, sha256 or _sha256(data), _stream(data),
+    ))
+
+
+def _data_size(store, upload_id) -> int:
+    return os.path.getsize(os.path.join(store.root, upload_id, "data.part"))
+
+
+def test_chunk_at_wrong_offset_is_rejected(tmp_path):
+    store = _store(tmp_path)
+    upload_id = store.create("user", "market.xlsx", 8)["upload_id"]
+    _write(store, upload_id, 0, 0, b"abcd")
+
+    with pytest.raises(HTTPException) as rejected:
+        _write(store, upload_id, 1, 2, b"efgh")
+
+    assert rejected.value.status_code == 409
+    assert rejected.value.headers["X-Upload-Offset"] == "4"
+    assert store.status(upload_id, "user")["offset"] == 4
+
+
+def test_retrying_the_last_chunk_is_a_no_op(tmp_path):
+    store = _store(tmp_path)
+    upload_id = store.create("user", "market.xlsx", 8)["upload_id"]
+    first = _write(store, upload_id, 0, 0, b"abcd")
+
+    retried = _write(store, upload_id, 0, 0, b"abcd")
+
+    assert retried == first
+    assert retried["offset"] == 4 and retried["next_chunk"] == 1
+    assert _data_size(store, upload_id) == 4
+
+    # The same chunk number with other content is a conflict, not a retry
+    with pytest.raises(HTTPException) as rejected:
+        _write(store, upload_id, 0, 0, b"wxyz")
+    assert rejected.value.status_code == 409
+
+
+def test_checksum_mismatch_truncates_the_chunk(tmp_path):
+    store = _store(tmp_path)
+    upload_id = store.create("user", "market.xlsx", 8)["upload_id"]
+    _write(store, upload_id, 0, 0, b"abcd")
+
+    with pytest.raises(HTTPException) as rejected:
+        _write(store, upload_id, 1, 4, b"efgh", sha256=_sha256(b"other"))
+
+    assert rejected.value.status_code == 400
+    assert _data_size(store, upload_id) == 4
+    assert store.status(upload_id, "user")["offset"] == 4
+
+    # The client resumes from the committed offset
+    assert _write(store, upload_id, 1, 4, b"efgh")["complete"]
+
+
+def _expire(store, upload_id):
+    meta = store._read_meta(upload_id)
+    meta["updated_at"] -= store.ttl + 1
+    store._write_meta(upload_id, meta)
+
+
+def test_garbage_collection_removes_expired_sessions(tmp_path):
+    store = _store(tmp_path)
+    expired = store.create("user", "old.xlsx", 8)["upload_id"]
+    busy = store.create("user", "busy.zip", 8)["upload_id"]
+    active = store.create("user", "new.xlsx", 8)["upload_id"]
+    _expire(store, expired)
+    _expire(store, busy)
+
+    with open(tmp_path / busy / "lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        removed = store.collect_garbage(force=True)
+
+    assert removed == 1
+    assert not (tmp_path / expired).exists()
+    assert store.status(active, "user")["offset"] == 0
+    # A session locked by a request in progress is left for the next sweep
+    assert (tmp_path / busy).exists()
+    assert store.collect_garbage(force=True) == 1
+    assert not (tmp_path / busy).exists()